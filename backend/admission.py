@@ -0,0 +1,239 @@
+import contextvars
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+
+from metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '1') == '1'
+
+# Per-user token buckets per endpoint class: (tokens per second, burst).
+# Override with <CLASS>_RATE_LIMIT and <CLASS>_RATE_BURST, e.g.
+# AUDIO_RATE_LIMIT=1 AUDIO_RATE_BURST=20. A rate of 0 disables the class.
+RATE_LIMIT_DEFAULTS = {
+    'audio': (0.5, 10),
+    'translation': (2.0, 30),
+    # /translate/batch, charged per uncached (text, language) pair; the burst
+    # fits one full batch of MAX_BATCH_TEXTS x MAX_BATCH_LANGUAGES
+    'translation_batch': (10.0, 5000),
+    'auth': (0.2, 10),
+}
+
+# Requests admitted concurrently per worker across the voice pipeline. Each
+# priority may only fill its share of the slots, so low priority work (plain
+# translation) is shed first and voice turns last.
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 64))
+HIGH, NORMAL, LOW = 'high', 'normal', 'low'
+PRIORITY_SHARES = {HIGH: 1.0, NORMAL: 0.85, LOW: 0.6}
+SHED_RETRY_AFTER_SECONDS = 1
+
+# Where buckets live: 'memory' (per worker) or 'redis' (shared by all workers
+# and hosts, REDIS_URL; needs the redis package)
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+_held = contextvars.ContextVar('admission_slots', default=None)
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used ones evicted beyond max_keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> Tuple[bool, float]:
+        """Take cost tokens; returns (allowed, seconds until enough tokens would be available)"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost, ttl. Uses the Redis clock so that
+# every worker sees the same refill.
+_REDIS_TAKE = """
+local rate, burst, cost, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, updated atomically by a Lua script"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = 'ratelimit:'):
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self._script = None
+
+    def _connect(self):
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self.url)
+            self._script = self._client.register_script(_REDIS_TAKE)
+        return self._script
+
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> Tuple[bool, float]:
+        script = self._connect()
+        # Keep idle buckets only as long as they take to refill completely
+        ttl = max(1, math.ceil(burst / rate))
+        allowed, tokens = await script(keys=[self.prefix + key], args=[rate, burst, cost, ttl])
+        allowed = bool(int(allowed))
+        return allowed, 0.0 if allowed else (cost - float(tokens)) / rate
+
+
+def create_bucket_store(backend: str = RATE_LIMIT_BACKEND):
+    if backend == 'redis':
+        return RedisBucketStore()
+    if backend != 'memory':
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}, expected 'memory' or 'redis'")
+    return MemoryBucketStore()
+
+
+class AdmissionController:
+    """Per-user rate limits per endpoint class plus a global, priority-aware concurrency limit.
+
+    Both reject immediately instead of queueing: 429 when a user's bucket is
+    empty, 503 when the worker is too busy for the request's priority. Both
+    carry a Retry-After header.
+    """
+
+    def __init__(self, store, limits: Dict[str, Tuple[float, int]] = None,
+                 max_concurrent: int = ADMISSION_MAX_CONCURRENT, shares: Dict[str, float] = PRIORITY_SHARES,
+                 enabled: bool = ADMISSION_CONTROL):
+        self.store = store
+        self.limits = {}
+        for name, (rate, burst) in (limits or RATE_LIMIT_DEFAULTS).items():
+            prefix = name.upper()
+            self.limits[name] = (
+                float(os.environ.get(f"{prefix}_RATE_LIMIT", rate)),
+                int(os.environ.get(f"{prefix}_RATE_BURST", burst)),
+            )
+        self.max_concurrent = max_concurrent
+        self.shares = shares
+        self.enabled = enabled
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.store_errors = 0
+
+    async def check_rate(self, endpoint_class: str, key: str, cost: int = 1):
+        if not self.enabled:
+            return
+        rate, burst = self.limits[endpoint_class]
+        if rate <= 0:
+            return
+        if cost > burst:
+            # Could never be admitted, however long the client waits
+            raise HTTPException(
+                status_code=413,
+                detail=f"Request counts as {cost} {endpoint_class} requests, more than the {burst} allowed at once; "
+                       f"please split it up",
+            )
+        try:
+            allowed, retry_after = await self.store.take(f"{endpoint_class}:{key}", rate, burst, cost)
+        except Exception as e:
+            # A broken shared store must not take the API down with it
+            self.store_errors += 1
+            logger.warning(f"Rate limit store unavailable, admitting request: {str(e)}")
+            return
+        if not allowed:
+            self.rate_limited += 1
+            ADMISSION_REJECTED.inc(endpoint_class=endpoint_class, reason='rate_limited')
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {endpoint_class} requests, please slow down",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def acquire(self, endpoint_class: str, priority: str):
+        """Take a concurrency slot, released by AdmissionMiddleware once the response has been sent"""
+        held = _held.get()
+        if held is None:
+            # Outside AdmissionMiddleware nobody would release the slot; WebSockets use hold()
+            return
+        held.append(self.hold(endpoint_class, priority))
+
+    def hold(self, endpoint_class: str, priority: str) -> int:
+        """Take a concurrency slot for the caller to hand back with release(); returns the slots taken"""
+        if not self.enabled:
+            return 0
+        if self.in_flight >= self.max_concurrent * self.shares[priority]:
+            self.shed += 1
+            ADMISSION_REJECTED.inc(endpoint_class=endpoint_class, reason='shed')
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": str(SHED_RETRY_AFTER_SECONDS)},
+            )
+        self.in_flight += 1
+        return 1
+
+    async def admit(self, endpoint_class: str, priority: str, key: str, cost: int = 1):
+        # Per-user limit first, so a client over its rate never takes a shared slot
+        await self.check_rate(endpoint_class, key, cost)
+        self.acquire(endpoint_class, priority)
+
+    def release(self, count: int):
+        self.in_flight -= count
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.store).__name__,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "limits": {name: {"rate": rate, "burst": burst} for name, (rate, burst) in self.limits.items()},
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "store_errors": self.store_errors,
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware releasing the concurrency slots a request took, after its last byte is sent"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        held = []
+        token = _held.set(held)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _held.reset(token)
+            if held:
+                self.controller.release(sum(held))
@@ -0,0 +1,381 @@
+import io
+import os
+import wave
+from collections import deque
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Speech recognition input: 16 kHz mono 16-bit PCM WAV
+TARGET_SAMPLE_RATE = 16000
+
+# Peak normalization target (about -1 dBFS), with a cap so near-silent input
+# is not blown up into something that looks like speech
+TARGET_PEAK = 0.9
+MAX_GAIN = 10.0
+
+# Energy-based voice activity detection used to trim leading/trailing silence.
+# A frame is voiced when its level is VAD_MARGIN_DB above the estimated noise
+# floor and above VAD_THRESHOLD_DB; VAD_PADDING_MS is kept around the speech.
+VAD_FRAME_MS = 20
+VAD_THRESHOLD_DB = float(os.environ.get('VAD_THRESHOLD_DB', -50))
+VAD_MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 10))
+VAD_PADDING_MS = int(os.environ.get('VAD_PADDING_MS', 200))
+
+# Streaming segmentation: a segment ends after SEGMENT_SILENCE_MS of silence
+# or once it reaches MAX_SEGMENT_SECONDS; MIN_SPEECH_MS of voiced frames start one
+SEGMENT_SILENCE_MS = int(os.environ.get('SEGMENT_SILENCE_MS', 500))
+MAX_SEGMENT_SECONDS = float(os.environ.get('MAX_SEGMENT_SECONDS', 15))
+MIN_SPEECH_MS = 60
+# How fast the noise floor estimate may rise per frame (it drops immediately)
+NOISE_FLOOR_RISE = 0.01
+
+# Taps of the windowed-sinc low-pass filter applied before downsampling
+RESAMPLE_TAPS = 64
+
+# Magic bytes of the containers browsers and recorders send
+_SIGNATURES = (
+    (b'RIFF', 'wav'),
+    (b'OggS', 'ogg'),
+    (b'\x1a\x45\xdf\xa3', 'webm'),
+    (b'fLaC', 'flac'),
+    (b'ID3', 'mp3'),
+)
+
+
+class AudioDecodeError(ValueError):
+    pass
+
+
+class Segment(NamedTuple):
+    index: int
+    samples: np.ndarray
+    start: float
+    end: float
+
+
+class PreprocessedAudio(NamedTuple):
+    wav: bytes
+    sample_rate: int
+    duration: float
+    original_duration: float
+    source_format: str
+    speech_found: bool
+
+
+def sniff_format(data: bytes, filename: Optional[str] = None) -> Optional[str]:
+    """Container format from the leading bytes, falling back to the file extension"""
+    for signature, name in _SIGNATURES:
+        if data.startswith(signature):
+            return name
+    if len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0:
+        return 'mp3'
+    if data[4:8] == b'ftyp':
+        return 'mp4'
+    if filename and '.' in filename:
+        return filename.rsplit('.', 1)[1].lower()
+    return None
+
+
+def _decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    with wave.open(io.BytesIO(data)) as wav_file:
+        channels = wav_file.getnchannels()
+        width = wav_file.getsampwidth()
+        rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        values = raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16)
+        samples = (np.where(values >= 1 << 23, values - (1 << 24), values)).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / (1 << 31)
+    else:
+        raise AudioDecodeError(f"unsupported WAV sample width {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def _decode_compressed(data: bytes, audio_format: Optional[str]) -> Tuple[np.ndarray, int]:
+    # pydub shells out to ffmpeg; imported here so WAV-only deployments never need it
+    from pydub import AudioSegment
+    try:
+        segment = AudioSegment.from_file(io.BytesIO(data), format=audio_format)
+    except Exception as e:
+        raise AudioDecodeError(f"could not decode {audio_format or 'audio'} (is ffmpeg installed?): {str(e)}")
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels), segment.frame_rate
+
+
+def decode(data: bytes, audio_format: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """Decode to float32 samples in [-1, 1] shaped (frames, channels), plus the sample rate"""
+    if not data:
+        raise AudioDecodeError("empty audio")
+    if audio_format == 'wav':
+        try:
+            return _decode_wav(data)
+        except (wave.Error, EOFError):
+            # e.g. IEEE float or other non-PCM WAV; let ffmpeg handle it
+            pass
+    return _decode_compressed(data, audio_format)
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    # A matrix-vector product is several times faster than mean(axis=1) on interleaved frames
+    return samples @ np.full(samples.shape[1], 1 / samples.shape[1], dtype=np.float32)
+
+
+def _lowpass_kernel(cutoff: float, taps: int = RESAMPLE_TAPS) -> np.ndarray:
+    """Hann-windowed sinc with cutoff as a fraction of the sample rate"""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Band-limit (when downsampling) and linearly interpolate onto the target rate"""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    if rate > target_rate:
+        samples = np.convolve(samples, _lowpass_kernel(0.5 * target_rate / rate), mode='same')
+        if rate % target_rate == 0:
+            # Integer ratio (48 kHz, 32 kHz): plain decimation, no interpolation needed
+            return samples[::rate // target_rate].astype(np.float32)
+    length = int(len(samples) * target_rate / rate)
+    positions = np.arange(length, dtype=np.float64) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+class StreamingResampler:
+    """resample() for a stream that arrives in chunks.
+
+    The low-pass filter history and the interpolation phase carry over from
+    one chunk to the next, so the concatenated output matches resampling the
+    whole stream at once instead of restarting at every chunk boundary. The
+    filter holds back its last taps // 2 input samples until flush().
+    """
+
+    def __init__(self, rate: int, target_rate: int = TARGET_SAMPLE_RATE, taps: int = RESAMPLE_TAPS):
+        self.rate = rate
+        self.target_rate = target_rate
+        self._kernel = _lowpass_kernel(0.5 * target_rate / rate, taps) if rate > target_rate else None
+        # np.convolve(mode='same') centres the kernel: taps - 1 - (taps - 1) // 2
+        # zeros precede the first sample and (taps - 1) // 2 follow the last
+        self._history = np.zeros(taps - 1 - (taps - 1) // 2, dtype=np.float32)
+        self._tail = (taps - 1) // 2
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._filtered = 0
+        self._emitted = 0
+
+    def feed(self, samples: np.ndarray) -> np.ndarray:
+        if self.rate == self.target_rate:
+            return samples
+        return self._interpolate(self._filter(samples.astype(np.float32, copy=False)))
+
+    def flush(self) -> np.ndarray:
+        """Resampled output for the samples still held back by the filter"""
+        if self.rate == self.target_rate or self._kernel is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._interpolate(self._filter(np.zeros(self._tail, dtype=np.float32)))
+
+    def _filter(self, samples: np.ndarray) -> np.ndarray:
+        if self._kernel is None:
+            return samples
+        data = np.concatenate((self._history, samples))
+        self._history = data[-(len(self._kernel) - 1):]
+        if len(data) < len(self._kernel):
+            return np.zeros(0, dtype=np.float32)
+        return np.convolve(data, self._kernel, mode='valid')
+
+    def _interpolate(self, filtered: np.ndarray) -> np.ndarray:
+        # Output sample k sits at input position k * rate / target_rate; emit
+        # every one up to the newest filtered sample, keeping that sample for
+        # interpolating across the next chunk boundary
+        start = self._filtered - len(self._carry)
+        data = np.concatenate((self._carry, filtered))
+        self._filtered += len(filtered)
+        if len(data) == 0:
+            return data
+        self._carry = data[-1:]
+        last = (self._filtered - 1) * self.target_rate // self.rate
+        count = last + 1 - self._emitted
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+        indexes = np.arange(self._emitted, self._emitted + count)
+        self._emitted += count
+        if self.rate % self.target_rate == 0:
+            return data[indexes * (self.rate // self.target_rate) - start].astype(np.float32)
+        positions = indexes * (self.rate / self.target_rate) - start
+        return np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+
+
+def normalize_gain(samples: np.ndarray) -> np.ndarray:
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    if peak == 0.0:
+        return samples
+    return samples * min(TARGET_PEAK / peak, MAX_GAIN)
+
+
+def frame_levels(samples: np.ndarray, sample_rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """RMS level in dBFS of each complete frame"""
+    frame_length = max(1, sample_rate * frame_ms // 1000)
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, bool]:
+    """Cut leading and trailing silence; returns (samples, whether any speech was found)"""
+    levels = frame_levels(samples, sample_rate)
+    if len(levels) == 0:
+        return samples, bool(len(samples) and np.any(samples))
+    noise_floor = float(np.percentile(levels, 10))
+    # Never demand more than VAD_MARGIN_DB below the loudest frame, so clips
+    # that are speech from end to end are not eaten into
+    threshold = max(VAD_THRESHOLD_DB, min(noise_floor + VAD_MARGIN_DB, float(levels.max()) - 2 * VAD_MARGIN_DB))
+    voiced = np.flatnonzero(levels > threshold)
+    if len(voiced) == 0:
+        return samples[:0], False
+    frame_length = max(1, sample_rate * VAD_FRAME_MS // 1000)
+    padding = VAD_PADDING_MS * sample_rate // 1000
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    return samples[start:end], True
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian 16-bit PCM bytes to float32 samples (a trailing odd byte is ignored)"""
+    return np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2').astype(np.float32) / 32768
+
+
+class StreamingSegmenter:
+    """Splits a live 16 kHz mono stream into utterances at pauses, as the audio arrives.
+
+    feed() takes samples in any chunk size and returns the segments completed
+    by them; flush() returns whatever speech is still open when the stream
+    ends. Frames are classified with the same energy VAD as trim_silence, but
+    against a running noise floor that drops to quieter frames immediately and
+    rises slowly, since the whole clip is never available.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, silence_ms: int = SEGMENT_SILENCE_MS,
+                 max_segment_seconds: float = MAX_SEGMENT_SECONDS, padding_ms: int = VAD_PADDING_MS):
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, sample_rate * VAD_FRAME_MS // 1000)
+        self.silence_frames = max(1, silence_ms // VAD_FRAME_MS)
+        self.max_frames = max(1, int(max_segment_seconds * 1000 // VAD_FRAME_MS))
+        self.padding_frames = padding_ms // VAD_FRAME_MS
+        self.min_speech_frames = max(1, MIN_SPEECH_MS // VAD_FRAME_MS)
+        self.noise_floor = VAD_THRESHOLD_DB - VAD_MARGIN_DB
+        self.segments = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=self.padding_frames + self.min_speech_frames)
+        self._frames = []
+        self._in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._position = 0
+        self._start = 0
+
+    def feed(self, samples: np.ndarray) -> List[Segment]:
+        data = np.concatenate((self._pending, samples.astype(np.float32, copy=False)))
+        count = len(data) // self.frame_length
+        self._pending = data[count * self.frame_length:]
+        if count == 0:
+            return []
+        frames = data[:count * self.frame_length].reshape(count, self.frame_length)
+        levels = frame_levels(frames.reshape(-1), self.sample_rate)
+
+        completed = []
+        for frame, level in zip(frames, levels):
+            segment = self._push(frame, float(level))
+            if segment is not None:
+                completed.append(segment)
+        return completed
+
+    def flush(self) -> Optional[Segment]:
+        if not self._in_speech:
+            return None
+        return self._emit(trailing_silence=self._silent_run)
+
+    def _push(self, frame: np.ndarray, level: float) -> Optional[Segment]:
+        voiced = level > max(VAD_THRESHOLD_DB, self.noise_floor + VAD_MARGIN_DB)
+        if level < self.noise_floor:
+            self.noise_floor = level
+        else:
+            self.noise_floor += NOISE_FLOOR_RISE * (level - self.noise_floor)
+        self._position += 1
+
+        if not self._in_speech:
+            self._preroll.append(frame)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.min_speech_frames:
+                self._in_speech = True
+                self._frames = list(self._preroll)
+                self._preroll.clear()
+                self._start = self._position - len(self._frames)
+                self._silent_run = 0
+            return None
+
+        self._frames.append(frame)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= self.silence_frames or len(self._frames) >= self.max_frames:
+            return self._emit(trailing_silence=self._silent_run)
+        return None
+
+    def _emit(self, trailing_silence: int) -> Segment:
+        # Keep only padding_frames of the silence that ended the segment
+        keep = len(self._frames) - max(0, trailing_silence - self.padding_frames)
+        frames = self._frames[:keep]
+        frame_seconds = self.frame_length / self.sample_rate
+        segment = Segment(
+            index=self.segments,
+            samples=np.concatenate(frames) if frames else np.zeros(0, dtype=np.float32),
+            start=self._start * frame_seconds,
+            end=(self._start + len(frames)) * frame_seconds,
+        )
+        self.segments += 1
+        self._frames = []
+        self._in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        return segment
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def preprocess(data: bytes, filename: Optional[str] = None, trim: bool = True) -> PreprocessedAudio:
+    """Decode any supported upload and return trimmed, gain-normalized 16 kHz mono WAV"""
+    audio_format = sniff_format(data, filename)
+    samples, rate = decode(data, audio_format)
+    original_duration = len(samples) / rate if rate else 0.0
+    samples = resample(to_mono(samples), rate)
+    samples = normalize_gain(samples)
+    speech_found = True
+    if trim:
+        samples, speech_found = trim_silence(samples, TARGET_SAMPLE_RATE)
+    return PreprocessedAudio(
+        wav=encode_wav(samples),
+        sample_rate=TARGET_SAMPLE_RATE,
+        duration=len(samples) / TARGET_SAMPLE_RATE,
+        original_duration=original_duration,
+        source_format=audio_format or 'unknown',
+        speech_found=speech_found,
+    )
@@ -0,0 +1,69 @@
+"""Rebuild the usage rollups from the voice command history.
+
+    python backfill_usage.py                      # every day before today (UTC)
+    python backfill_usage.py --since 2026-01-01 --until 2026-02-01
+    python backfill_usage.py --batch-size 500 --pause 0.1
+
+Reads voice_commands in _id order, --batch-size documents per query with
+--pause seconds between batches, and overwrites the rollups for the whole
+days in [--since, --until). Safe to re-run. --until defaults to the start of
+today, because live writes keep incrementing today's rollups meanwhile.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from usage_rollups import UsageRollups
+
+logger = logging.getLogger("backfill_usage")
+
+
+def parse_day(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+async def backfill(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        rollups = UsageRollups(db.usage_rollups)
+        await rollups.create_indexes()
+        return await rollups.rebuild(
+            db.voice_commands,
+            until=args.until,
+            since=args.since,
+            batch_size=args.batch_size,
+            pause=args.pause,
+        )
+    finally:
+        client.close()
+
+
+def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=parse_day, default=None, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_day, default=today, help="day after the last one to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.until > today:
+        logger.warning("Rebuilding today's rollups while commands are being written can miscount them")
+    result = asyncio.run(backfill(args))
+    logger.info(
+        f"Scanned {result['commands_scanned']} commands, wrote {result['rollups_written']} rollups, "
+        f"deleted {result['rollups_deleted']} stale ones in {result['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
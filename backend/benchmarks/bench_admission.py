@@ -0,0 +1,99 @@
+"""A flooding client vs. a regular user, with and without admission control.
+
+One user floods POST /api/translate with many concurrent requests while
+another translates at a steady pace through the same translation backend.
+Reports the regular user's latency and the flooder's outcomes, showing that
+rejections are immediate and the regular user stays fast when admission
+control is on:
+
+    python benchmarks/bench_admission.py
+    python benchmarks/bench_admission.py --flood 2000 --flood-concurrency 128 --latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+from harness import benchmark_app, configure_offline_environment, percentile, register_and_login
+
+
+async def scenario(server, client, flooder, regular, args, enabled):
+    server.admission.enabled = enabled
+    statuses = Counter()
+    reject_latencies = []
+    regular_latencies = []
+    counter = iter(range(args.flood))
+    stop = asyncio.Event()
+
+    async def flood():
+        for index in counter:
+            started = time.perf_counter()
+            response = await client.post("/api/translate", json={"text": f"flood {enabled} {index}", "target_language": "hi"},
+                                         headers=flooder)
+            statuses[response.status_code] += 1
+            if response.status_code in (429, 503):
+                reject_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)) * args.backoff)
+
+    async def steady():
+        index = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.post("/api/translate", json={"text": f"regular {enabled} {index}", "target_language": "ta"},
+                                         headers=regular)
+            if response.status_code == 200:
+                regular_latencies.append(time.perf_counter() - started)
+            index += 1
+            await asyncio.sleep(args.interval)
+
+    regular_task = asyncio.create_task(steady())
+    started = time.perf_counter()
+    await asyncio.gather(*(flood() for _ in range(args.flood_concurrency)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await regular_task
+    return {
+        "wall_s": wall,
+        "statuses": dict(sorted(statuses.items())),
+        "reject_p95_ms": percentile(reject_latencies, 0.95) * 1000,
+        "regular_requests": len(regular_latencies),
+        "regular_p50_ms": percentile(regular_latencies, 0.50) * 1000,
+        "regular_p95_ms": percentile(regular_latencies, 0.95) * 1000,
+    }
+
+
+async def run(args):
+    rows = []
+    async with benchmark_app() as (server, client):
+        flooder = await register_and_login(client, "flooder")
+        regular = await register_and_login(client, "regular")
+        for enabled in (False, True):
+            rows.append((enabled, await scenario(server, client, flooder, regular, args, enabled)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flood", type=int, default=1000, help="translate requests sent by the flooding user")
+    parser.add_argument("--flood-concurrency", type=int, default=64)
+    parser.add_argument("--interval", type=float, default=0.1, help="pause between the regular user's requests")
+    parser.add_argument("--backoff", type=float, default=0.1, help="fraction of Retry-After the flooder honours")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated provider latency in seconds")
+    args = parser.parse_args()
+
+    configure_offline_environment(provider_latency=args.latency)
+    os.environ["PASSWORD_HASH_WORKERS"] = "0"
+    # Fewer translation workers than flooding clients, so the backend saturates
+    os.environ.setdefault("TRANSLATE_MAX_WORKERS", "8")
+    os.environ.setdefault("TRANSLATE_MAX_QUEUE", "256")
+    print(f"{'admission':<11}{'wall s':>8}{'user n':>8}{'user p50':>10}{'user p95':>10}{'reject p95':>12}  flood statuses")
+    for enabled, row in asyncio.run(run(args)):
+        print(
+            f"{'on' if enabled else 'off':<11}{row['wall_s']:>8.2f}{row['regular_requests']:>8}{row['regular_p50_ms']:>10.1f}"
+            f"{row['regular_p95_ms']:>10.1f}{row['reject_p95_ms']:>12.2f}  {row['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
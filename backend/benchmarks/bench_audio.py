@@ -0,0 +1,71 @@
+"""Cost and payoff of audio preprocessing on clips from 1 to 60 seconds.
+
+Synthesizes 48 kHz stereo speech-like clips with a second of leading and
+trailing silence (less for short clips), runs audio.preprocess on each and
+reports the processing time next to how much smaller the recognition payload
+gets. It calls audio.preprocess on its own, not the upload endpoints: a
+48 kHz stereo WAV over about 55 seconds is larger than the default
+MAX_UPLOAD_BYTES (10 MB), and such rows are marked "over upload limit".
+
+    python benchmarks/bench_audio.py
+    python benchmarks/bench_audio.py --durations 1 10 60 --sample-rate 44100 --repeat 10
+    python benchmarks/bench_audio.py --formats wav ogg mp3   # compressed formats need ffmpeg
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+
+from harness import speech_like_samples, speech_wav
+
+# Same default as server.py; larger uploads are refused with 413 before preprocessing
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+
+
+def encode(seconds, sample_rate, channels, audio_format):
+    lead_silence = min(1.0, seconds / 4)
+    if audio_format == "wav":
+        return speech_wav(seconds, sample_rate, channels, lead_silence)
+    from pydub import AudioSegment
+    samples = speech_like_samples(seconds, sample_rate, channels, lead_silence)
+    segment = AudioSegment(samples.tobytes(), frame_rate=sample_rate, sample_width=2, channels=channels)
+    buffer = io.BytesIO()
+    segment.export(buffer, format=audio_format)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", nargs="+", type=float, default=[1, 5, 15, 30, 60])
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--formats", nargs="+", default=["wav"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import audio
+
+    print(f"{'format':<7}{'seconds':>8}{'input KB':>10}{'output KB':>11}{'kept s':>8}{'median ms':>11}{'ms per s':>10}")
+    for audio_format in args.formats:
+        for seconds in args.durations:
+            try:
+                data = encode(seconds, args.sample_rate, args.channels, audio_format)
+            except Exception as e:
+                print(f"{audio_format:<7}{seconds:>8.0f}  skipped: {str(e)}")
+                continue
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                prepared = audio.preprocess(data, f"clip.{audio_format}")
+                timings.append(time.perf_counter() - started)
+            median = statistics.median(timings)
+            print(
+                f"{audio_format:<7}{seconds:>8.0f}{len(data) / 1024:>10.0f}{len(prepared.wav) / 1024:>11.0f}"
+                f"{prepared.duration:>8.2f}{median * 1000:>11.1f}{median * 1000 / seconds:>10.2f}"
+                + ("  over upload limit" if len(data) > MAX_UPLOAD_BYTES else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Offline load benchmark for the API endpoints.
+
+Runs the app in-process over an httpx ASGI transport with local ASR/translation/TTS
+stand-ins and an in-memory Mongo, so it needs no network access:
+
+    python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --concurrency 1 8 32 --requests 200 --latency 0.05
+    python benchmarks/bench_endpoints.py --json results.json
+    python benchmarks/bench_endpoints.py --baseline results.json --tolerance 0.25   # fail on p95 regressions
+
+Provider latency (--latency) is the simulated round trip of each remote call.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from harness import (
+    benchmark_app,
+    configure_offline_environment,
+    register_and_login,
+    run_load,
+    speech_wav,
+    summarize,
+)
+
+
+def scenarios(auth, audio):
+    """Endpoint name -> coroutine factory taking (client, unique request tag)"""
+    return {
+        "protected": lambda client, i: client.get("/api/protected", headers=auth),
+        "process-voice": lambda client, i: client.post(
+            "/api/process-voice",
+            params={"transcribed_text": "hello what time is it", "detected_language": "en", "target_language": "hi"},
+            headers=auth,
+        ),
+        "translate": lambda client, i: client.post(
+            "/api/translate", json={"text": f"Good morning number {i}", "target_language": "ta"}, headers=auth
+        ),
+        "translate-cached": lambda client, i: client.post(
+            "/api/translate", json={"text": "Good morning", "target_language": "ta"}, headers=auth
+        ),
+        "text-to-speech": lambda client, i: client.post(
+            "/api/text-to-speech", params={"text": f"Sentence number {i}", "language": "en"}, headers=auth
+        ),
+        "speech-to-text": lambda client, i: client.post(
+            "/api/speech-to-text", files={"file": ("clip.wav", audio, "audio/wav")}, headers=auth
+        ),
+        "voice-turn": lambda client, i: client.post(
+            "/api/voice-turn", params={"target_language": "hi"},
+            files={"file": ("clip.wav", audio, "audio/wav")}, headers=auth,
+        ),
+        "command-history": lambda client, i: client.get("/api/command-history", params={"limit": 20}, headers=auth),
+    }
+
+
+async def run(args):
+    results = {}
+    async with benchmark_app(db_latency=args.db_latency) as (server, client):
+        auth = await register_and_login(client)
+        audio = speech_wav(args.audio_seconds)
+        available = scenarios(auth, audio)
+        selected = args.endpoints or list(available)
+
+        for name in selected:
+            make = available[name]
+            results[name] = {}
+            for concurrency in args.concurrency:
+                # Tags are unique per level so uncached scenarios never hit results from an earlier level
+                await run_load(lambda i: make(client, f"warm {concurrency} {i}"), min(10, args.requests), concurrency)
+                latencies, errors, wall = await run_load(
+                    lambda i: make(client, f"run {concurrency} {i}"), args.requests, concurrency
+                )
+                results[name][str(concurrency)] = summarize(latencies, errors, wall)
+    return results
+
+
+def print_table(results):
+    print(f"{'endpoint':<18}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, levels in results.items():
+        for concurrency, row in levels.items():
+            print(
+                f"{name:<18}{concurrency:>6}{row['throughput_rps']:>10.1f}{row['p50_ms']:>10.1f}"
+                f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}"
+            )
+
+
+def compare(results, baseline, tolerance):
+    """List p95 regressions beyond tolerance relative to a baseline results file"""
+    regressions = []
+    for name, levels in results.items():
+        for concurrency, row in levels.items():
+            previous = baseline.get(name, {}).get(concurrency)
+            if previous and previous["p95_ms"] > 0 and row["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name} @ {concurrency}: p95 {previous['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="*", help="subset of scenarios to run")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated provider latency in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="simulated database latency in seconds")
+    parser.add_argument("--audio-seconds", type=float, default=1.0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 increase")
+    args = parser.parse_args()
+
+    configure_offline_environment(provider_latency=args.latency)
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
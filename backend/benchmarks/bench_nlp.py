@@ -0,0 +1,107 @@
+"""Transcript normalization cost: micro-batched nlp.pipe vs. one spaCy call per request.
+
+Simulates concurrent requests each normalizing one utterance and reports
+utterances per second, latency, and CPU time per utterance:
+
+    python benchmarks/bench_nlp.py
+    python benchmarks/bench_nlp.py --concurrency 1 16 64 256 --utterances 5000 --wait-ms 2
+
+Uses the pipelines from NLP_MODELS when installed (e.g. en_core_web_sm for
+English lemmas), blank tokenizers otherwise.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from harness import summarize
+
+UTTERANCES = {
+    'en': [
+        "what is the current time", "tell me a funny joke please", "hello there, good morning",
+        "can you translate this sentence for me", "I was laughing at the jokes you told yesterday",
+        "what's the weather going to be like this evening", "convert this into hindi",
+    ],
+    'hi': ["अभी समय क्या है", "मुझे एक मज़ाक सुनाओ", "नमस्ते, आप कैसे हैं", "इसका अनुवाद करो"],
+    'ta': ["இப்போது நேரம் என்ன", "வணக்கம் நண்பரே", "ஒரு நகைச்சுவை சொல்லுங்கள்"],
+}
+
+
+class PerRequest:
+    """One nlp() call per utterance on a worker thread, the unbatched baseline"""
+
+    def __init__(self, normalizer):
+        self.normalizer = normalizer
+
+    async def normalize(self, text, language):
+        return await asyncio.to_thread(self.normalizer.normalize, text, language)
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+async def drive(strategy, texts, concurrency):
+    latencies = []
+    work = iter(texts)
+
+    async def client():
+        for language, text in work:
+            started = time.perf_counter()
+            await strategy.normalize(text, language)
+            latencies.append(time.perf_counter() - started)
+
+    strategy.start()
+    try:
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+    finally:
+        await strategy.stop()
+    row = summarize(latencies, 0, wall)
+    row["cpu_us_per_utterance"] = cpu / len(latencies) * 1e6
+    return row
+
+
+async def run(args):
+    from nlp import BatchNormalizer, TextNormalizer
+
+    normalizer = TextNormalizer().load(UTTERANCES)
+    rng = random.Random(0)
+    pool = [(language, text) for language, texts in UTTERANCES.items() for text in texts]
+    texts = [rng.choice(pool) for _ in range(args.utterances)]
+
+    rows = []
+    for concurrency in args.concurrency:
+        strategies = {
+            "per-request": PerRequest(normalizer),
+            "batched": BatchNormalizer(normalizer.normalize_batch, max_batch=args.max_batch, max_wait=args.wait_ms / 1000),
+        }
+        for label, strategy in strategies.items():
+            row = await drive(strategy, texts, concurrency)
+            if label == "batched":
+                row["mean_batch"] = strategy.stats()["mean_batch_size"]
+            rows.append((label, concurrency, row))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--utterances", type=int, default=2000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<13}{'conc':>6}{'utt/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'CPU us/utt':>12}{'batch':>7}")
+    for label, concurrency, row in asyncio.run(run(args)):
+        print(
+            f"{label:<13}{concurrency:>6}{row['throughput_rps']:>10.0f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+            f"{row['cpu_us_per_utterance']:>12.0f}{row.get('mean_batch', 1):>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
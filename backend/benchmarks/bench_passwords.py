@@ -0,0 +1,99 @@
+"""Login throughput with bcrypt inline on the event loop vs. on process pools of growing size.
+
+Drives POST /api/login in-process (mock Mongo, ASGI transport) and reports
+logins per second, latency and the worst event loop stall seen while the
+burst was running:
+
+    python benchmarks/bench_passwords.py
+    python benchmarks/bench_passwords.py --workers 1 2 4 8 --logins 200 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from harness import benchmark_app, configure_offline_environment, run_load, summarize
+
+
+class InlineHasher:
+    """The old behaviour: bcrypt called directly from the async handler"""
+
+    def __init__(self):
+        import passwords
+        self.passwords = passwords
+
+    async def hash(self, password):
+        return self.passwords.hash_password(password)
+
+    async def verify(self, password, hashed_password):
+        return self.passwords.verify_password(password, hashed_password)
+
+    async def warm_up(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+async def max_loop_lag(stop, interval=0.005):
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(args):
+    from passwords import PasswordHasher
+
+    rows = []
+    async with benchmark_app() as (server, client):
+        credentials = {"username": "bench", "email": "bench@benchmark.local", "password": "benchmark-password"}
+        await client.post("/api/register", json=credentials)
+        login = {"email": credentials["email"], "password": credentials["password"]}
+
+        configurations = [("inline", InlineHasher())]
+        configurations += [(f"processes={workers}", PasswordHasher(workers)) for workers in args.workers]
+        for label, hasher in configurations:
+            previous, server.password_hasher = server.password_hasher, hasher
+            try:
+                await hasher.warm_up()
+                concurrency = max(args.concurrency, getattr(hasher, "max_workers", 1) * 2)
+                stop = asyncio.Event()
+                lag = asyncio.create_task(max_loop_lag(stop))
+                latencies, errors, wall = await run_load(
+                    lambda i: client.post("/api/login", json=login), args.logins, concurrency
+                )
+                stop.set()
+                rows.append((label, concurrency, summarize(latencies, errors, wall), await lag))
+            finally:
+                server.password_hasher = previous
+                hasher.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", nargs="+", type=int,
+                        default=sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor (BCRYPT_ROUNDS)")
+    args = parser.parse_args()
+
+    # Must be set before passwords.py is imported
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    configure_offline_environment()
+    print(f"bcrypt rounds={args.rounds}, cores={cores}")
+    print(f"{'hasher':<14}{'conc':>6}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max loop stall ms':>20}")
+    for label, concurrency, row, lag in asyncio.run(run(args)):
+        print(
+            f"{label:<14}{concurrency:>6}{row['throughput_rps']:>10.1f}{row['p50_ms']:>10.1f}"
+            f"{row['p95_ms']:>10.1f}{lag * 1000:>20.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Memory and throughput of the pre-forking launcher vs. independent uvicorn workers.
+
+Starts the app with `python serve.py --workers N` and with
+`uvicorn server:app --workers N` (each worker imports and loads everything on
+its own), then reports per-worker RSS and PSS (proportional set size, which
+splits shared pages between the processes using them) and requests per second
+against a cheap endpoint over real sockets. Each worker starts its bcrypt
+process pool as in production, so the bcrypt processes started by each
+launcher and the PSS of the whole process tree are reported too:
+
+    python benchmarks/bench_prefork.py
+    python benchmarks/bench_prefork.py --workers 1 2 4 --requests 4000 --concurrency 64
+
+Linux only (reads /proc/<pid>/smaps_rollup). Throughput only scales with
+workers up to the number of cores, which is printed first.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from harness import BACKEND_DIR, configure_offline_environment, run_load, summarize
+
+
+def children(pid):
+    found = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces; the parent PID follows its closing paren
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry.name))
+    return found
+
+
+def memory_kib(pid):
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        name, _, rest = line.partition(":")
+        if name in ("Rss", "Pss"):
+            values[name] = int(rest.split()[0])
+    return values
+
+
+def cmdline(pid):
+    try:
+        return Path(f"/proc/{pid}/cmdline").read_bytes()
+    except OSError:
+        return b""
+
+
+def descendants(pid):
+    found = []
+    for child in children(pid):
+        found.append(child)
+        found.extend(descendants(child))
+    return found
+
+
+def worker_pids(launcher, workers):
+    if workers == 1 and b"uvicorn" in cmdline(launcher.pid):
+        # uvicorn serves in-process when asked for a single worker
+        return [launcher.pid]
+    # uvicorn --workers also starts multiprocessing's resource tracker
+    return [pid for pid in children(launcher.pid) if b"resource_tracker" not in cmdline(pid)]
+
+
+def hash_pids(launcher, workers):
+    # bcrypt pool processes are spawned by the workers
+    return [pid for worker in worker_pids(launcher, workers) for pid in children(worker) if b"spawn_main" in cmdline(pid)]
+
+
+async def wait_until_serving(port, workers, launcher, timeout=120):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        while time.monotonic() < deadline:
+            if launcher.poll() is not None:
+                raise RuntimeError(f"launcher exited with status {launcher.returncode}")
+            try:
+                if (await client.get("/api/")).status_code == 200 and len(worker_pids(launcher, workers)) >= workers:
+                    # Give the remaining workers time to finish startup
+                    await asyncio.sleep(2)
+                    return
+            except (httpx.HTTPError, OSError):
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+async def measure(command, port, workers, args):
+    import httpx
+
+    launcher = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_serving(port, workers, launcher)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            await run_load(lambda i: client.get(args.path), min(200, args.requests), args.concurrency)
+            row = summarize(*await run_load(lambda i: client.get(args.path), args.requests, args.concurrency))
+        memory = [memory_kib(pid) for pid in worker_pids(launcher, workers)]
+        row["rss_mib"] = sum(item["Rss"] for item in memory) / len(memory) / 1024
+        row["pss_mib"] = sum(item["Pss"] for item in memory) / len(memory) / 1024
+        row["hash_processes"] = len(hash_pids(launcher, workers))
+        tree = [launcher.pid] + descendants(launcher.pid)
+        row["tree_pss_mib"] = sum(memory_kib(pid)["Pss"] for pid in tree) / 1024
+        return row
+    finally:
+        launcher.send_signal(signal.SIGTERM)
+        try:
+            launcher.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            launcher.kill()
+            launcher.wait()
+
+
+async def run(args):
+    rows = []
+    for workers in args.workers:
+        launchers = {
+            "serve.py": [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port),
+                         "--log-level", "warning"],
+            "uvicorn": [sys.executable, "-m", "uvicorn", "server:app", "--workers", str(workers),
+                        "--port", str(args.port), "--log-level", "warning"],
+        }
+        for label, command in launchers.items():
+            rows.append((label, workers, await measure(command, args.port, workers, args)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", nargs="+", type=int,
+                        default=sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/api/supported-languages")
+    args = parser.parse_args()
+
+    configure_offline_environment()
+    print(f"cores={cores}, {args.requests} x GET {args.path} at concurrency {args.concurrency}")
+    print(f"{'launcher':<10}{'workers':>8}{'req/s':>10}{'p95 ms':>10}{'RSS MiB':>10}{'PSS MiB':>10}"
+          f"{'bcrypt procs':>14}{'tree PSS MiB':>14}")
+    for label, workers, row in asyncio.run(run(args)):
+        print(
+            f"{label:<10}{workers:>8}{row['throughput_rps']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['rss_mib']:>10.1f}{row['pss_mib']:>10.1f}{row['hash_processes']:>14}{row['tree_pss_mib']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Import-time and cold-start benchmark for the backend worker.
+
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --importtime   # top modules by cumulative import time
+
+Import time is measured in fresh interpreters. Cold start launches
+`uvicorn server:app` and times how long until /api/ answers and until
+/api/health/ready reports ready (or the timeout expires, e.g. without MongoDB).
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure_import(runs):
+    code = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def top_imports(limit):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "").split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                return False
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def measure_cold_start(runs, timeout):
+    samples = []
+    for _ in range(runs):
+        port = free_port()
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env={**os.environ, "PREBUILD_RESPONSE_CATALOG": "0"},
+        )
+        try:
+            deadline = started + timeout
+            serving = wait_for(f"http://127.0.0.1:{port}/api/", deadline)
+            first_response = time.perf_counter() - started if serving else None
+            ready = serving and wait_for(f"http://127.0.0.1:{port}/api/health/ready", deadline)
+            ready_after = time.perf_counter() - started if ready else None
+            samples.append((first_response, ready_after))
+        finally:
+            process.terminate()
+            process.wait()
+    return samples
+
+
+def summarize(label, values):
+    values = [value for value in values if value is not None]
+    if not values:
+        print(f"{label:<28} n/a")
+        return
+    print(f"{label:<28} min {min(values) * 1000:8.1f} ms   median {statistics.median(values) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each cold start")
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports")
+    parser.add_argument("--skip-cold-start", action="store_true")
+    args = parser.parse_args()
+
+    summarize("import server", measure_import(args.runs))
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for cumulative_us, self_us, name in top_imports(15):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:8.1f} ms self  {name}")
+
+    if not args.skip_cold_start:
+        samples = measure_cold_start(args.runs, args.timeout)
+        print()
+        summarize("cold start -> first response", [first for first, _ in samples])
+        summarize("cold start -> ready", [ready for _, ready in samples])
+
+
+if __name__ == "__main__":
+    main()
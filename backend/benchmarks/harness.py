@@ -0,0 +1,127 @@
+"""Shared setup for the in-process benchmarks: local providers, mock Mongo and an ASGI client."""
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def configure_offline_environment(provider_latency=0.05, state_dir=None):
+    """Select local providers and throwaway cache paths before server is imported"""
+    state_dir = state_dir or tempfile.mkdtemp(prefix="voice-bench-")
+    os.environ.update({
+        "ASR_PROVIDER": "local",
+        "TRANSLATION_PROVIDER": "local",
+        "TTS_PROVIDER": "local",
+        "LOCAL_PROVIDER_LATENCY": str(provider_latency),
+        "TTS_CACHE_DIR": os.path.join(state_dir, "tts_cache"),
+        "RESPONSE_CATALOG_PATH": os.path.join(state_dir, "response_catalog.json"),
+        "PREBUILD_RESPONSE_CATALOG": "0",
+    })
+    # Benchmarks drive one user far past the per-user rate limits
+    os.environ.setdefault("ADMISSION_CONTROL", "0")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "benchmark")
+    return state_dir
+
+
+def speech_like_samples(seconds=1.0, sample_rate=16000, channels=1, lead_silence=0.25, seed=0):
+    """Int16 samples of syllable-like tone bursts with quiet noise and leading/trailing silence"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    t = np.arange(total) / sample_rate
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) ** 0.5
+    voiced = (t >= lead_silence) & (t < seconds - lead_silence)
+    signal = 0.4 * envelope * voiced * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 0.5 * t)) * t)
+    signal = signal + rng.normal(0, 0.001, total)
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+    return np.repeat(pcm[:, None], channels, axis=1)
+
+
+def speech_wav(seconds=1.0, sample_rate=16000, channels=1, lead_silence=0.25):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(speech_like_samples(seconds, sample_rate, channels, lead_silence).tobytes())
+    return buffer.getvalue()
+
+
+@contextlib.asynccontextmanager
+async def benchmark_app(db_latency=0.001):
+    """Yield (server module, httpx client) with the app started against a mock database"""
+    import httpx
+    import server
+    from mock_mongo import MockClient
+
+    server.client = MockClient(latency=db_latency)
+    server.db = server.client[os.environ["DB_NAME"]]
+    server.history_writer.collection = server.db.voice_commands
+
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            yield server, client
+    finally:
+        await server.app.router.shutdown()
+
+
+async def register_and_login(client, name="bench"):
+    credentials = {"username": name, "email": f"{name}@benchmark.local", "password": "benchmark-password"}
+    await client.post("/api/register", json=credentials)
+    response = await client.post("/api/login", json={"email": credentials["email"], "password": credentials["password"]})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(make_request, total, concurrency):
+    """Issue `total` requests with `concurrency` workers; returns (latencies, errors, wall seconds)"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            started = time.perf_counter()
+            response = await make_request(index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, wall_seconds):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
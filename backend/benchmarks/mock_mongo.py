@@ -0,0 +1,205 @@
+"""In-memory stand-in for the subset of Motor the backend uses, for offline benchmarks.
+
+Supports equality, $lt/$lte/$gt/$gte/$in/$or filters, include/exclude
+projections, multi-key sorts, unique indexes, $set/$inc/$setOnInsert updates
+with upsert (also through bulk_write), delete_many and a fixed per-operation
+latency so database round trips can be simulated.
+"""
+import asyncio
+import copy
+import uuid
+
+from pymongo.errors import DuplicateKeyError
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+            continue
+        value = document.get(field)
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            for operator, operand in condition.items():
+                if operator == "$lt" and not (value is not None and value < operand):
+                    return False
+                if operator == "$lte" and not (value is not None and value <= operand):
+                    return False
+                if operator == "$gt" and not (value is not None and value > operand):
+                    return False
+                if operator == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    included = {field for field, flag in projection.items() if flag and field != "_id"}
+    if included:
+        result = {field: copy.deepcopy(document[field]) for field in included if field in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    excluded = {field for field, flag in projection.items() if not flag}
+    return {field: copy.deepcopy(value) for field, value in document.items() if field not in excluded}
+
+
+def _apply_update(document, update, inserting):
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserting):
+            document.update(copy.deepcopy(fields))
+        elif operator == "$inc":
+            for field, amount in fields.items():
+                document[field] = document.get(field, 0) + amount
+
+
+class MockCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        documents = [doc for doc in self._collection.documents if _matches(doc, self._query)]
+        for field, direction in reversed(self._sort):
+            documents.sort(key=lambda doc: (doc.get(field) is not None, doc.get(field)), reverse=direction < 0)
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(doc, self._projection) for doc in documents]
+
+    async def to_list(self, length=None):
+        await self._collection.database.round_trip()
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection.database.round_trip()
+        for document in self._results():
+            yield document
+
+
+class MockCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = []
+        self.unique_fields = set()
+
+    async def create_index(self, keys, unique=False, name=None, **kwargs):
+        await self.database.round_trip()
+        if unique and isinstance(keys, str):
+            self.unique_fields.add(keys)
+        return name or str(keys)
+
+    def _insert(self, document):
+        for field in self.unique_fields:
+            if field in document and any(doc.get(field) == document[field] for doc in self.documents):
+                raise DuplicateKeyError(f"duplicate key on {field}")
+        document.setdefault("_id", uuid.uuid4().hex)
+        self.documents.append(copy.deepcopy(document))
+
+    async def insert_one(self, document):
+        await self.database.round_trip()
+        self._insert(document)
+
+    async def insert_many(self, documents, ordered=True):
+        await self.database.round_trip()
+        for document in documents:
+            self._insert(document)
+
+    async def update_one(self, query, update, upsert=False):
+        await self.database.round_trip()
+        self._update_one(query, update, upsert)
+
+    async def bulk_write(self, operations, ordered=True):
+        await self.database.round_trip()
+        for operation in operations:
+            self._update_one(operation._filter, operation._doc, operation._upsert)
+
+    async def delete_many(self, query):
+        await self.database.round_trip()
+        self.documents = [doc for doc in self.documents if not _matches(doc, query)]
+
+    def _update_one(self, query, update, upsert):
+        for document in self.documents:
+            if _matches(document, query):
+                _apply_update(document, update, inserting=False)
+                return
+        if upsert:
+            document = {field: value for field, value in query.items() if not field.startswith("$")}
+            _apply_update(document, update, inserting=True)
+            self._insert(document)
+
+    async def find_one(self, query=None, projection=None):
+        await self.database.round_trip()
+        for document in self.documents:
+            if _matches(document, query or {}):
+                return _project(document, projection)
+        return None
+
+    def find(self, query=None, projection=None, **kwargs):
+        return MockCursor(self, query or {}, projection)
+
+    async def count_documents(self, query):
+        await self.database.round_trip()
+        return sum(1 for doc in self.documents if _matches(doc, query))
+
+
+class MockDatabase:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._collections = {}
+
+    async def round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MockCollection(self, name)
+        return self._collections[name]
+
+    async def command(self, name, *args, **kwargs):
+        await self.round_trip()
+        return {"ok": 1.0}
+
+
+class MockClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MockDatabase(self.latency)
+        return self._databases[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from metrics import BACKEND_ERRORS, stage
+from resilience import CircuitBreaker, LatencyTracker, remaining_budget
+
+
+# Default sizing per backend: (max_workers, max_queue, timeout_seconds).
+# Each value can be overridden with <NAME>_MAX_WORKERS, <NAME>_MAX_QUEUE and
+# <NAME>_TIMEOUT environment variables, e.g. ASR_MAX_WORKERS=8.
+BACKEND_DEFAULTS = {
+    'audio': (4, 32, 10.0),
+    'asr': (4, 16, 30.0),
+    'detect': (4, 32, 5.0),
+    'nlp': (1, 4, 5.0),
+    'translate': (8, 64, 10.0),
+    'tts': (4, 32, 20.0),
+}
+
+RETRY_AFTER_SECONDS = int(os.environ.get('BACKEND_RETRY_AFTER', '1'))
+
+# Circuit breaker: open after BREAKER_FAILURES consecutive failures (timeouts or
+# provider errors) and fail fast for BREAKER_COOLDOWN seconds before a trial call
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 10))
+
+# Backends whose calls are idempotent enough to hedge: when a call is still
+# running after the backend's recent p95 latency, a second identical call is
+# started and whichever finishes first wins. Off unless listed, e.g.
+# HEDGE_BACKENDS=translate,detect,tts
+HEDGE_BACKENDS = {name.strip() for name in os.environ.get('HEDGE_BACKENDS', '').split(',') if name.strip()}
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.95))
+
+
+class BackendPool:
+    """Runs blocking calls for one backend on its own bounded thread pool.
+
+    Each call gets min(timeout, time left in the request budget), goes through
+    the backend's circuit breaker and is optionally hedged.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float, hedge: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.hedge = hedge
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+        self.latency = LatencyTracker()
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-backend")
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on this pool, shedding load once the queue is full"""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            BACKEND_ERRORS.inc(backend=self.name, kind='rejected')
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.name} backend is busy, please retry",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        timeout = self.timeout
+        budget = remaining_budget()
+        if budget is not None:
+            if budget <= 0:
+                BACKEND_ERRORS.inc(backend=self.name, kind='deadline')
+                raise HTTPException(status_code=504, detail=f"Request deadline exceeded before calling {self.name} backend")
+            timeout = min(timeout, budget)
+
+        if not self.breaker.allow():
+            BACKEND_ERRORS.inc(backend=self.name, kind='circuit_open')
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.name} backend is unavailable, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(self.breaker.retry_after())))},
+            )
+        # allow() only lets a call through a circuit that is not closed as its half-open trial
+        trial = self.breaker.state == self.breaker.HALF_OPEN
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with stage(self.name):
+                result = await self._call(func, args, kwargs, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.breaker.record_failure()
+            BACKEND_ERRORS.inc(backend=self.name, kind='timeout')
+            raise HTTPException(status_code=504, detail=f"{self.name} backend timed out")
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect, dropped hedge); says nothing about the backend
+            if trial:
+                self.breaker.release_trial()
+            raise
+        except HTTPException:
+            # A deliberate rejection of the input (e.g. undecodable audio); the backend itself is healthy
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            BACKEND_ERRORS.inc(backend=self.name, kind='error')
+            raise
+        finally:
+            self.in_flight -= 1
+        self.breaker.record_success()
+        self.latency.record(time.perf_counter() - started)
+        return result
+
+    async def _call(self, func, args, kwargs, timeout):
+        primary = asyncio.ensure_future(self._submit(func, args, kwargs))
+        delay = self.latency.percentile(HEDGE_PERCENTILE) if self.hedge else None
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(primary, timeout)
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or self.in_flight >= self.capacity:
+            # Finished within p95, or no spare capacity to spend on a duplicate
+            return await asyncio.wait_for(primary, timeout - delay)
+
+        self.hedged += 1
+        self.in_flight += 1
+        hedge = asyncio.ensure_future(self._submit(func, args, kwargs))
+        pending = {primary, hedge}
+        deadline = time.monotonic() + timeout - delay
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    # Both attempts failed; surface the primary's error
+                    return primary.result()
+        finally:
+            self.in_flight -= 1
+            for task in pending:
+                task.cancel()
+
+    async def _submit(self, func, args, kwargs):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "hedging": self.hedge,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": self.latency.percentile(0.95),
+            "circuit": self.breaker.stats(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BackendDispatcher:
+    """Registry of per-backend pools so one slow service cannot starve the others"""
+
+    def __init__(self, defaults: dict = BACKEND_DEFAULTS):
+        self.pools = {}
+        for name, (max_workers, max_queue, timeout) in defaults.items():
+            prefix = name.upper()
+            self.pools[name] = BackendPool(
+                name,
+                max_workers=int(os.environ.get(f"{prefix}_MAX_WORKERS", max_workers)),
+                max_queue=int(os.environ.get(f"{prefix}_MAX_QUEUE", max_queue)),
+                timeout=float(os.environ.get(f"{prefix}_TIMEOUT", timeout)),
+                hedge=name in HEDGE_BACKENDS,
+            )
+
+    async def run(self, backend: str, func, *args, **kwargs):
+        return await self.pools[backend].run(func, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+backends = BackendDispatcher()
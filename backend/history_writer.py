@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+
+from pymongo.errors import BulkWriteError
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'inline')
+
+DUPLICATE_KEY = 11000
+
+
+class HistoryWriter:
+    """Buffers voice command documents and writes them with insert_many off the response path.
+
+    A batch is flushed once max_batch documents are waiting or flush_interval
+    seconds after the first one arrived, whichever comes first. At most
+    max_queue documents are held in memory; beyond that the overflow policy
+    decides whether submit() waits ('block'), discards a document
+    ('drop_oldest' / 'drop_newest') or writes it directly ('inline').
+    Documents that fail to insert are retried max_retries times with
+    exponential backoff, while new ones queue up behind them. Written
+    documents are passed on to rollups.record(), if given.
+    """
+
+    def __init__(self, collection, max_batch: int = 100, flush_interval: float = 0.5,
+                 max_queue: int = 10000, overflow: str = 'block', rollups=None,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.rollups = rollups
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+        self._buffer = deque()
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flushed = asyncio.Event()
+        # Buffered or in-flight documents per user, for wait_written()
+        self._pending = Counter()
+        self._closing = False
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still buffered and stop the background task"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_items.set()
+        self._batch_full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, document: dict):
+        if self._task is None:
+            # Not running (e.g. before startup or after shutdown): write through
+            await self._insert([document])
+            return
+
+        while len(self._buffer) >= self.max_queue:
+            if self.overflow == 'drop_newest':
+                self.dropped += 1
+                return
+            if self.overflow == 'drop_oldest':
+                self._settle([self._buffer.popleft()])
+                self.dropped += 1
+                break
+            if self.overflow == 'inline':
+                await self._insert([document])
+                return
+            self._space.clear()
+            await self._space.wait()
+
+        self._buffer.append(document)
+        self._pending[document.get('user_id')] += 1
+        self.enqueued += 1
+        self._has_items.set()
+        if len(self._buffer) >= self.max_batch:
+            self._batch_full.set()
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            if not self._closing and len(self._buffer) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush()
+            if not self._buffer:
+                self._has_items.clear()
+                self._batch_full.clear()
+                if self._closing:
+                    return
+            elif len(self._buffer) < self.max_batch and not self._closing:
+                self._batch_full.clear()
+
+    async def wait_written(self, user_id, timeout: float = 2.0):
+        """Wait (at most timeout seconds) until the documents submitted so far for user_id are written.
+
+        Lets a user read back the command they just made instead of finding
+        it still buffered.
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending.get(user_id) and self._task is not None:
+            # Flush now rather than at the end of the interval
+            self._batch_full.set()
+            flushed = self._flushed
+            try:
+                await asyncio.wait_for(flushed.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return
+
+    def _settle(self, documents):
+        for document in documents:
+            user_id = document.get('user_id')
+            self._pending[user_id] -= 1
+            if self._pending[user_id] <= 0:
+                del self._pending[user_id]
+
+    async def _flush(self):
+        batch = []
+        while self._buffer and len(batch) < self.max_batch:
+            batch.append(self._buffer.popleft())
+        self._space.set()
+        if batch:
+            try:
+                await self._insert(batch)
+            finally:
+                self._settle(batch)
+        flushed, self._flushed = self._flushed, asyncio.Event()
+        flushed.set()
+
+    async def _insert(self, batch):
+        started = time.perf_counter()
+        pending = batch
+        written = []
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                with stage('mongo_history_insert'):
+                    await self.collection.insert_many(pending, ordered=False)
+                written.extend(pending)
+                pending = []
+            except BulkWriteError as e:
+                # ordered=False attempts every document; retry only the ones that failed.
+                # A duplicate key means an earlier attempt wrote it and its reply was lost.
+                failed = {error['index'] for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY}
+                written.extend(document for index, document in enumerate(pending) if index not in failed)
+                pending = [document for index, document in enumerate(pending) if index in failed]
+                error = e
+            except Exception as e:
+                error = e
+            if not pending:
+                break
+            logger.warning(f"Failed to write {len(pending)} voice commands (attempt {attempt + 1}): {str(error)}")
+
+        if pending:
+            self.failed += len(pending)
+            logger.error(f"Giving up on {len(pending)} voice commands after {self.max_retries + 1} attempts: {str(error)}")
+        self.written += len(written)
+        if written and self.rollups is not None:
+            await self.rollups.record(written)
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.last_flush_seconds = elapsed
+        self.total_flush_seconds += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._buffer),
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
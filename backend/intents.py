@@ -0,0 +1,102 @@
+import bisect
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+
+# Keyword table per intent, in priority order: when two intents score the
+# same, the one listed first wins.
+INTENT_KEYWORDS = {
+    'time': ['time', 'clock', 'what time', 'current time', 'samay', 'waqt', 'కాలం', 'நேரம்', 'സമയം'],
+    'joke': ['joke', 'jokes', 'funny', 'humor', 'laugh', 'हंसी', 'मज़ाक', 'హాస్యం', 'நகைச்சுवை', 'തമാശ'],
+    'greeting': ['hello', 'hi', 'hey', 'good morning', 'good evening', 'namaste', 'नमस्ते', 'वणक्कम्', 'നമസ്കാരം'],
+    'translate': ['translate', 'convert', 'meaning', 'अनुवाद', 'மொழிபெயர्पு', 'অনুবাদ', 'అనువాదం'],
+}
+
+DEFAULT_INTENT = 'general'
+
+
+def _combining_mark_class() -> str:
+    """Regex class body for combining marks and joiners that continue a word in Indic scripts.
+
+    Python's \\w does not include vowel signs or viramas, so without these a
+    keyword would match inside a longer Devanagari/Tamil/... word.
+    """
+    ranges = []
+    start = prev = None
+    for cp in range(0x0300, 0x0E00):
+        if unicodedata.category(chr(cp)) in ('Mn', 'Mc', 'Me'):
+            if prev is not None and cp == prev + 1:
+                prev = cp
+                continue
+            if start is not None:
+                ranges.append((start, prev))
+            start = prev = cp
+    if start is not None:
+        ranges.append((start, prev))
+    body = ''.join(f"\\u{a:04x}-\\u{b:04x}" if a != b else f"\\u{a:04x}" for a, b in ranges)
+    return body + "\\u200c\\u200d"
+
+
+_WORD_CHAR = f"[\\w{_combining_mark_class()}]"
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize('NFC', text).casefold()
+
+
+class IntentMatcher:
+    """Single-pass keyword matcher compiled from an intent table"""
+
+    def __init__(self, table: Dict[str, List[str]], default: str = DEFAULT_INTENT):
+        self.intents = list(table)
+        self.default = default
+        self._priority = {intent: index for index, intent in enumerate(self.intents)}
+        self._phrase_intent = {}
+        for intent, keywords in table.items():
+            for keyword in keywords:
+                phrase = ' '.join(_normalize(keyword).split())
+                self._phrase_intent.setdefault(phrase, intent)
+
+        # Longest phrases first so 'what time' wins over 'time' at the same offset
+        phrases = sorted(self._phrase_intent, key=len, reverse=True)
+        alternatives = '|'.join(r'\s+'.join(re.escape(word) for word in phrase.split()) for phrase in phrases)
+        self._pattern = re.compile(f"(?<!{_WORD_CHAR})(?:{alternatives})(?!{_WORD_CHAR})")
+
+    def _intent_for(self, match) -> str:
+        return self._phrase_intent[' '.join(match.group(0).split())]
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Number of keyword hits per intent (intents without hits are omitted)"""
+        scores = {}
+        for match in self._pattern.finditer(_normalize(text)):
+            intent = self._intent_for(match)
+            scores[intent] = scores.get(intent, 0) + 1
+        return scores
+
+    def _best(self, scores: Dict[str, int]) -> str:
+        if not scores:
+            return self.default
+        return min(scores, key=lambda intent: (-scores[intent], self._priority[intent]))
+
+    def classify(self, text: str) -> str:
+        return self._best(self.scores(text))
+
+    def classify_batch(self, texts: Iterable[str]) -> List[str]:
+        """Classify many utterances with a single scan over their NUL-joined concatenation"""
+        normalized = [_normalize(text) for text in texts]
+        starts = []
+        offset = 0
+        for text in normalized:
+            starts.append(offset)
+            offset += len(text) + 1
+
+        scores = [{} for _ in normalized]
+        for match in self._pattern.finditer('\0'.join(normalized)):
+            index = bisect.bisect_right(starts, match.start()) - 1
+            intent = self._intent_for(match)
+            scores[index][intent] = scores[index].get(intent, 0) + 1
+        return [self._best(item) for item in scores]
+
+
+intent_matcher = IntentMatcher(INTENT_KEYWORDS)
@@ -0,0 +1,95 @@
+from typing import Iterable, List, NamedTuple, Optional
+
+
+# Unicode blocks that identify a supported language on their own
+SCRIPT_BLOCKS = [
+    (0x0900, 0x097F, 'devanagari', 'hi'),
+    (0x0B80, 0x0BFF, 'tamil', 'ta'),
+    (0x0C00, 0x0C7F, 'telugu', 'te'),
+    (0x0C80, 0x0CFF, 'kannada', 'kn'),
+    (0x0D00, 0x0D7F, 'malayalam', 'ml'),
+]
+
+LATIN = 'latin'
+OTHER = 'other'
+
+# Common English words; Latin text without enough of these is treated as
+# possibly romanized Indic and left to the remote detector.
+ENGLISH_MARKERS = frozenset("""
+a about all am an and are as at be can could did do does for from get give good have he hello help hey hi how
+i if in is it its joke me morning my no not now of on or please say show so tell thank thanks that the this time
+to translate us was we what when where which who why will with would you your
+""".split())
+
+_LOOKUP_LIMIT = 0x0D80
+
+
+def _build_lookup():
+    table = [None] * _LOOKUP_LIMIT
+    for cp in range(_LOOKUP_LIMIT):
+        char = chr(cp)
+        if ('a' <= char <= 'z') or ('A' <= char <= 'Z') or (0x00C0 <= cp <= 0x024F and char.isalpha()):
+            table[cp] = LATIN
+    for start, end, script, _ in SCRIPT_BLOCKS:
+        for cp in range(start, end + 1):
+            table[cp] = script
+    return table
+
+
+_SCRIPT_OF = _build_lookup()
+_LANGUAGE_OF = {script: language for _, _, script, language in SCRIPT_BLOCKS}
+
+
+class Detection(NamedTuple):
+    language: str
+    confidence: float
+    script: str
+
+
+def script_counts(text: str) -> dict:
+    """Count letters per script in a single pass over the code points"""
+    counts = {}
+    for char in text:
+        cp = ord(char)
+        if cp < _LOOKUP_LIMIT:
+            script = _SCRIPT_OF[cp]
+            if script is None:
+                continue
+        elif char.isalpha():
+            script = OTHER
+        else:
+            continue
+        counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def detect_language(text: str, min_confidence: float = 0.6) -> Optional[Detection]:
+    """Classify text by script, or return None when the remote detector should decide"""
+    counts = script_counts(text)
+    total = sum(counts.values())
+    if not total:
+        return None
+
+    script = max(counts, key=counts.get)
+    confidence = counts[script] / total
+    if confidence < min_confidence:
+        return None
+
+    if script in _LANGUAGE_OF:
+        return Detection(_LANGUAGE_OF[script], confidence, script)
+
+    if script == LATIN:
+        words = [word.strip(".,!?'\"").lower() for word in text.split()]
+        words = [word for word in words if word]
+        if not words:
+            return None
+        english_share = sum(word in ENGLISH_MARKERS for word in words) / len(words)
+        # Short utterances need one marker, longer ones a reasonable share
+        if english_share >= 0.3 or (len(words) <= 2 and english_share > 0):
+            return Detection('en', confidence * max(english_share, 0.5), script)
+
+    return None
+
+
+def detect_languages(texts: Iterable[str], min_confidence: float = 0.6) -> List[Optional[Detection]]:
+    return [detect_language(text, min_confidence) for text in texts]
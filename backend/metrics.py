@@ -0,0 +1,353 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cached lookup up to a slow remote call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Audio payload buckets in bytes, 1 KiB to 16 MiB
+BYTE_BUCKETS = tuple(1024 * 4 ** power for power in range(8))
+
+TRACE_HEADER = 'x-trace-id'
+TRACE_ALL_REQUESTS = os.environ.get('TRACE_ALL_REQUESTS', '0') == '1'
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 2.0))
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                bucket_labels = {**labels, 'le': _format_value(bound)}
+                yield f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format.
+
+    Besides the metrics created here, collectors registered with
+    add_collector() are called at scrape time and yield
+    (name, kind, documentation, [(labels, value), ...]) tuples, which is how
+    the stats() of caches, pools and writers are exported without
+    double bookkeeping.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'pipeline_stage_seconds', 'Time spent per pipeline stage (backend call, bcrypt, database)', ['stage'])
+STAGE_FAILURES = registry.counter(
+    'pipeline_stage_failures_total', 'Pipeline stages that raised, by exception type', ['stage', 'error'])
+BACKEND_ERRORS = registry.counter(
+    'backend_errors_total', 'Backend calls that failed, by backend and kind (rejected, timeout, error)',
+    ['backend', 'kind'])
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status code', ['method', 'route', 'status'])
+HTTP_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time from request start to the last response byte', ['method', 'route'])
+HTTP_IN_FLIGHT = registry.gauge('http_requests_in_flight', 'HTTP requests currently being served')
+WEBSOCKET_SESSIONS = registry.gauge('websocket_sessions', 'Open streaming voice WebSocket sessions')
+AUDIO_BYTES = registry.histogram(
+    'audio_payload_bytes', 'Audio sizes: uploads, preprocessed recognition input (asr), WebSocket streams (stream) and synthesized speech (tts)', ['direction'], BYTE_BUCKETS)
+ADMISSION_REJECTED = registry.counter(
+    'admission_rejected_total', 'Requests refused before any work: per-user rate limit (429) or load shedding (503)',
+    ['endpoint_class', 'reason'])
+LOOP_LAG = registry.histogram(
+    'event_loop_lag_seconds', 'How late the event loop ran a timer; high values mean blocking work on the loop')
+
+
+class Trace:
+    """Stage timings collected for one request"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.stages = []
+
+    def add(self, stage: str, seconds: float):
+        self.stages.append((stage, seconds))
+
+    def totals(self) -> dict:
+        totals = {}
+        for stage, seconds in self.stages:
+            total, count = totals.get(stage, (0.0, 0))
+            totals[stage] = (total + seconds, count + 1)
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. 'asr;dur=812.4, translate;dur=40.2;desc="x2"'"""
+        parts = []
+        for stage, (total, count) in self.totals().items():
+            part = f"{stage};dur={total * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a block as a pipeline stage, in the histogram and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        STAGE_FAILURES.inc(stage=name, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+def _trace_id(value: Optional[str]) -> str:
+    """Accept a caller-supplied trace ID if it is a sane token, otherwise make one"""
+    if value and re.fullmatch(r"[A-Za-z0-9._-]{1,64}", value):
+        return value
+    return uuid.uuid4().hex
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request metrics and a stage trace per request.
+
+    Requests carrying an X-Trace-Id header (an empty value asks the server to
+    pick one), or all requests when TRACE_ALL_REQUESTS=1, get X-Trace-Id and
+    Server-Timing response headers with the stages finished before the
+    response started. Requests slower than SLOW_REQUEST_SECONDS are logged
+    with their full stage breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        requested = headers.get(TRACE_HEADER.encode())
+        trace = Trace(_trace_id(requested.decode('latin-1') if requested else None))
+        expose = requested is not None or TRACE_ALL_REQUESTS
+        token = _current_trace.set(trace)
+        status_code = 500
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if expose:
+                    extra = [(b'x-trace-id', trace.trace_id.encode())]
+                    timing = trace.server_timing()
+                    if timing:
+                        extra.append((b'server-timing', timing.encode()))
+                    message = {**message, 'headers': list(message.get('headers', [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _current_trace.reset(token)
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            HTTP_SECONDS.observe(elapsed, method=method, route=route_path)
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status_code)
+            if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+                breakdown = ", ".join(
+                    f"{name}={total * 1000:.0f}ms" + (f" (x{count})" if count > 1 else "")
+                    for name, (total, count) in trace.totals().items()
+                )
+                logger.warning(
+                    f"Slow request {method} {route_path} took {elapsed * 1000:.0f}ms "
+                    f"[trace {trace.trace_id}]: {breakdown or 'no stages recorded'}"
+                )
+
+
+class EventLoopMonitor:
+    """Samples event loop lag: how much later than scheduled a periodic timer fires"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# spaCy package per language, e.g. NLP_MODELS=en:en_core_web_sm,de:de_core_news_sm.
+# Languages without an installed package get a blank pipeline: tokenizer and
+# stop words only, no lemmas.
+NLP_MODELS = dict(
+    item.strip().split(':', 1)
+    for item in os.environ.get('NLP_MODELS', 'en:en_core_web_sm').split(',')
+    if ':' in item
+)
+
+# Components normalization never uses; excluded so they are not even loaded
+EXCLUDED_COMPONENTS = (
+    'parser', 'ner', 'senter', 'textcat', 'textcat_multilabel',
+    'entity_linker', 'entity_ruler', 'span_ruler', 'spancat',
+)
+
+# Micro-batching of concurrent requests: wait at most NLP_BATCH_WAIT_MS for
+# more texts before running a batch of up to NLP_MAX_BATCH through nlp.pipe
+NLP_MAX_BATCH = int(os.environ.get('NLP_MAX_BATCH', 64))
+NLP_BATCH_WAIT = float(os.environ.get('NLP_BATCH_WAIT_MS', 2)) / 1000
+
+
+class Normalized(NamedTuple):
+    language: str
+    tokens: List[str]
+    lemmatized: bool
+
+    @property
+    def text(self) -> str:
+        return ' '.join(self.tokens)
+
+
+class TextNormalizer:
+    """Tokenization, stop word removal and (where a trained pipeline is installed) lemmatization.
+
+    One spaCy pipeline per language, loaded once and shared by every caller.
+    """
+
+    def __init__(self, models: Dict[str, str] = NLP_MODELS):
+        self.models = models
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def load(self, languages: Iterable[str]):
+        for language in languages:
+            self.pipeline(language)
+        return self
+
+    def pipeline(self, language: str):
+        nlp = self._pipelines.get(language)
+        if nlp is None:
+            with self._lock:
+                nlp = self._pipelines.get(language)
+                if nlp is None:
+                    nlp = self._pipelines[language] = self._load(language)
+        return nlp
+
+    def _load(self, language: str):
+        import spacy
+
+        name = self.models.get(language)
+        if name:
+            try:
+                nlp = spacy.load(name, exclude=list(EXCLUDED_COMPONENTS))
+                logger.info(f"Loaded spaCy pipeline {name} for {language}: {', '.join(nlp.pipe_names)}")
+                return nlp
+            except OSError:
+                logger.info(f"spaCy package {name} is not installed, using a blank {language} tokenizer")
+        try:
+            return spacy.blank(language)
+        except ImportError:
+            return spacy.blank('xx')
+
+    def normalize_batch(self, texts: List[str], language: str) -> List[Normalized]:
+        nlp = self.pipeline(language)
+        lemmatized = 'lemmatizer' in nlp.pipe_names
+        results = []
+        for doc in nlp.pipe(texts, batch_size=max(1, len(texts))):
+            tokens = [
+                (token.lemma_ if lemmatized and token.lemma_ else token.text).casefold()
+                for token in doc
+                if not (token.is_stop or token.is_punct or token.is_space)
+            ]
+            results.append(Normalized(language, tokens, lemmatized))
+        return results
+
+    def normalize(self, text: str, language: str) -> Normalized:
+        return self.normalize_batch([text], language)[0]
+
+
+class BatchNormalizer:
+    """Collects normalize() calls from concurrent requests and runs them through nlp.pipe together.
+
+    While traffic is concurrent, the first text of a batch waits up to
+    max_wait seconds for as many others as the previous batch held. The
+    batch is then split by language and each group is passed to
+    normalize_batch(texts, language) through run_batch (by default on a
+    worker thread). One batch is processed at a time, so under load the next
+    batch fills while the current one runs.
+    """
+
+    def __init__(self, normalize_batch, run_batch=None, max_batch: int = NLP_MAX_BATCH, max_wait: float = NLP_BATCH_WAIT):
+        self.normalize_batch = normalize_batch
+        self.run_batch = run_batch or asyncio.to_thread
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.texts = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.total_batch_seconds = 0.0
+
+        self._last_batch = 0
+        self._expected = 0
+        self._enough = asyncio.Event()
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def normalize(self, text: str, language: str) -> Normalized:
+        if self._task is None:
+            # Not started (e.g. a script using the module directly): no batching
+            return (await self.run_batch(self.normalize_batch, [text], language))[0]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, language, future))
+        if self._expected and self._queue.qsize() >= self._expected:
+            self._enough.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                # Wait (at most max_wait) until as many texts are queued as were
+                # in the last batch; a lone request on an idle server goes
+                # straight through
+                expected = min(self.max_batch, self._last_batch) - 1
+                if self.max_wait and expected > 0 and self._queue.qsize() < expected:
+                    self._expected = expected
+                    self._enough.clear()
+                    try:
+                        await asyncio.wait_for(self._enough.wait(), self.max_wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        self._expected = 0
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._process(batch)
+            except asyncio.CancelledError:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+
+    async def _process(self, batch):
+        started = time.perf_counter()
+        by_language = {}
+        for text, language, future in batch:
+            if not future.done():
+                by_language.setdefault(language, []).append((text, future))
+        for language, items in by_language.items():
+            try:
+                results = await self.run_batch(self.normalize_batch, [text for text, _ in items], language)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+        self.texts += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self._last_batch = len(batch)
+        self.total_batch_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "texts": self.texts,
+            "batches": self.batches,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "mean_batch_ms": round(self.total_batch_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
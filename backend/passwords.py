@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# bcrypt work factor for new hashes. Stored hashes with a different factor are
+# rehashed transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Return (valid, replacement hash or None if the stored hash is current)"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def _ping():
+    return os.getpid()
+
+
+class PasswordHasher:
+    """Runs bcrypt on a process pool so hashing never holds the event loop or the GIL.
+
+    The pool is created on first use (after any fork of the serving process)
+    with 'spawn' workers, which import only this module. If a worker dies
+    (e.g. OOM-killed) the broken pool is replaced and the call retried once.
+    max_workers=0 runs bcrypt on the default thread pool instead, for
+    environments where extra processes are not allowed.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None and self.max_workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        executor = self._pool()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            logger.warning("Password hashing pool broke, starting a new one")
+            # Concurrent callers may have replaced it already
+            if self._executor is executor:
+                self.shutdown()
+            return await loop.run_in_executor(self._pool(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_password, password, hashed_password)
+
+    async def warm_up(self):
+        """Start every worker process now instead of on the first logins"""
+        if self.max_workers > 0:
+            await asyncio.gather(*(self._run(_ping) for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,196 @@
+import io
+import math
+import os
+import struct
+import time
+import wave
+from abc import ABC, abstractmethod
+from typing import Iterator, NamedTuple
+
+import lang_detect
+
+
+class Translation(NamedTuple):
+    text: str
+    src: str
+    dest: str
+
+
+class Detected(NamedTuple):
+    lang: str
+    confidence: float
+
+
+class ASRProvider(ABC):
+    """Speech-to-text backend; implementations are blocking and run on the asr pool"""
+    name = 'asr'
+
+    @abstractmethod
+    def transcribe(self, audio_data: bytes) -> str:
+        ...
+
+
+class TranslationProvider(ABC):
+    """Translation and language detection backend"""
+    name = 'translation'
+
+    @abstractmethod
+    def translate(self, text: str, dest: str, src: str = 'auto') -> Translation:
+        ...
+
+    @abstractmethod
+    def detect(self, text: str) -> Detected:
+        ...
+
+
+class TTSProvider(ABC):
+    """Text-to-speech backend"""
+    name = 'tts'
+    content_type = 'audio/mpeg'
+
+    def synthesize(self, text: str, language: str, slow: bool = False) -> bytes:
+        return b"".join(self.stream(text, language, slow))
+
+    @abstractmethod
+    def stream(self, text: str, language: str, slow: bool = False) -> Iterator[bytes]:
+        ...
+
+
+# Google-backed providers (the production default)
+
+class GoogleASR(ASRProvider):
+    name = 'google'
+
+    def __init__(self):
+        import speech_recognition
+        self.sr = speech_recognition
+        self.recognizer = speech_recognition.Recognizer()
+
+    def transcribe(self, audio_data: bytes) -> str:
+        with self.sr.AudioFile(io.BytesIO(audio_data)) as source:
+            audio = self.recognizer.record(source)
+        return self.recognizer.recognize_google(audio)
+
+
+class GoogleTranslation(TranslationProvider):
+    name = 'google'
+
+    def __init__(self):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def translate(self, text: str, dest: str, src: str = 'auto') -> Translation:
+        translated = self.translator.translate(text, dest=dest, src=src)
+        return Translation(translated.text, translated.src, translated.dest)
+
+    def detect(self, text: str) -> Detected:
+        detected = self.translator.detect(text)
+        return Detected(detected.lang, getattr(detected, 'confidence', None) or 0.5)
+
+
+class GoogleTTS(TTSProvider):
+    name = 'google'
+
+    def __init__(self):
+        from gtts import gTTS
+        self.gTTS = gTTS
+
+    def synthesize(self, text: str, language: str, slow: bool = False) -> bytes:
+        buffer = io.BytesIO()
+        self.gTTS(text=text, lang=language, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def stream(self, text: str, language: str, slow: bool = False) -> Iterator[bytes]:
+        return self.gTTS(text=text, lang=language, slow=slow).stream()
+
+
+# Deterministic local stand-ins for offline development, CI and benchmarks.
+# Each sleeps for a configurable latency to mimic the remote round trip.
+
+class LocalASR(ASRProvider):
+    name = 'local'
+
+    def __init__(self, transcript: str = "hello what time is it", latency: float = 0.0):
+        self.transcript = transcript
+        self.latency = latency
+
+    def transcribe(self, audio_data: bytes) -> str:
+        time.sleep(self.latency)
+        return self.transcript
+
+
+class LocalTranslation(TranslationProvider):
+    name = 'local'
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def translate(self, text: str, dest: str, src: str = 'auto') -> Translation:
+        time.sleep(self.latency)
+        if src == 'auto':
+            detected = lang_detect.detect_language(text)
+            src = detected.language if detected else 'en'
+        return Translation(text if src == dest else f"[{dest}] {text}", src, dest)
+
+    def detect(self, text: str) -> Detected:
+        time.sleep(self.latency)
+        detected = lang_detect.detect_language(text, min_confidence=0.0)
+        if detected is None:
+            return Detected('en', 0.1)
+        return Detected(detected.language, detected.confidence)
+
+
+class LocalTTS(TTSProvider):
+    """Renders each sentence as a short sine tone (16 kHz mono WAV) instead of speech"""
+    name = 'local'
+    content_type = 'audio/wav'
+
+    def __init__(self, latency: float = 0.0, sample_rate: int = 16000, seconds_per_char: float = 0.01):
+        self.latency = latency
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+
+    def _tone(self, text: str, language: str) -> bytes:
+        frequency = 220 + 20 * (sum(language.encode()) % 12)
+        frames = max(1, int(len(text) * self.seconds_per_char * self.sample_rate))
+        step = 2 * math.pi * frequency / self.sample_rate
+        return struct.pack(f"<{frames}h", *(int(8000 * math.sin(step * i)) for i in range(frames)))
+
+    def synthesize(self, text: str, language: str, slow: bool = False) -> bytes:
+        time.sleep(self.latency)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self._tone(text, language))
+        return buffer.getvalue()
+
+    def stream(self, text: str, language: str, slow: bool = False) -> Iterator[bytes]:
+        # WAV needs its header up front, so the tone is yielded as one part
+        yield self.synthesize(text, language, slow)
+
+
+def _latency(kind: str) -> float:
+    return float(os.environ.get(f"LOCAL_{kind}_LATENCY", os.environ.get('LOCAL_PROVIDER_LATENCY', 0.0)))
+
+
+def create_asr_provider() -> ASRProvider:
+    if os.environ.get('ASR_PROVIDER', 'google') == 'local':
+        return LocalASR(
+            transcript=os.environ.get('LOCAL_ASR_TRANSCRIPT', "hello what time is it"),
+            latency=_latency('ASR'),
+        )
+    return GoogleASR()
+
+
+def create_translation_provider() -> TranslationProvider:
+    if os.environ.get('TRANSLATION_PROVIDER', 'google') == 'local':
+        return LocalTranslation(latency=_latency('TRANSLATION'))
+    return GoogleTranslation()
+
+
+def create_tts_provider() -> TTSProvider:
+    if os.environ.get('TTS_PROVIDER', 'google') == 'local':
+        return LocalTTS(latency=_latency('TTS'))
+    return GoogleTTS()
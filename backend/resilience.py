@@ -0,0 +1,178 @@
+import contextlib
+import contextvars
+import os
+import time
+from collections import deque
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+# Default time budget for one HTTP request, shared by every backend call it
+# makes. Clients may ask for less (never more) with an X-Request-Timeout header.
+REQUEST_BUDGET_SECONDS = float(os.environ.get('REQUEST_BUDGET_SECONDS', 30))
+
+# Serve partial answers (English text, no audio) instead of errors when an
+# optional dependency fails
+DEGRADED_RESPONSES = os.environ.get('DEGRADED_RESPONSES', '1') == '1'
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+_degraded = contextvars.ContextVar('degraded', default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None outside a request"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def can_degrade(error: Exception) -> bool:
+    """Whether a failed dependency call may be answered with a degraded response.
+
+    Overload, timeouts, open circuits and provider errors qualify; deliberate
+    4xx rejections of the input do not.
+    """
+    if not DEGRADED_RESPONSES:
+        return False
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500
+    return True
+
+
+def mark_degraded(feature: str):
+    """Record that this request's answer is missing a feature (e.g. 'translation', 'tts')"""
+    features = _degraded.get()
+    if features is not None and feature not in features:
+        features.append(feature)
+
+
+def degraded_features() -> List[str]:
+    return list(_degraded.get() or [])
+
+
+@contextlib.contextmanager
+def track_degradation():
+    """Collect mark_degraded() calls for a unit of work outside HTTP requests, e.g. a WebSocket session"""
+    token = _degraded.set([])
+    try:
+        yield
+    finally:
+        _degraded.reset(token)
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving each HTTP request an absolute deadline for its backend calls.
+
+    It also collects degraded features and reports them in an X-Degraded
+    response header when they are known before the response starts.
+    """
+
+    def __init__(self, app, budget: float = REQUEST_BUDGET_SECONDS):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        budget = self.budget
+        requested = dict(scope.get('headers') or []).get(b'x-request-timeout')
+        if requested:
+            try:
+                budget = min(budget, max(0.0, float(requested)))
+            except ValueError:
+                pass
+        token = _deadline.set(time.monotonic() + budget)
+        degraded = []
+        degraded_token = _degraded.set(degraded)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and degraded:
+                headers = list(message.get('headers', [])) + [(b'x-degraded', ','.join(degraded).encode())]
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _degraded.reset(degraded_token)
+            _deadline.reset(token)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After failure_threshold failures in a row the circuit opens and calls are
+    refused for cooldown seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_after() == 0.0:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def release_trial(self):
+        """Give up the half-open trial without an outcome (e.g. the call was cancelled), so another call may try"""
+        self._trial_running = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.opened,
+            "retry_after": round(self.retry_after(), 2) if self.state == self.OPEN else 0.0,
+        }
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call durations"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyResource:
+    """An expensive object (client, model, heavy module) created on first use.
+
+    shareable marks read-only objects without sockets or threads (models,
+    lookup tables) that a pre-forking launcher may load once in the parent
+    and share copy-on-write with its workers.
+    """
+
+    def __init__(self, name: str, loader: Callable, required: bool = True, shareable: bool = False):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.shareable = shareable
+        self.load_seconds = None
+        self.error = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                    self._loaded = True
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                finally:
+                    self.load_seconds = time.perf_counter() - started
+        return self._value
+
+    def status(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "required": self.required,
+            "shareable": self.shareable,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class ResourceRegistry:
+    """Named lazy resources plus a background warm-up for the ones requests need"""
+
+    def __init__(self):
+        self.resources: Dict[str, LazyResource] = {}
+        self.warm_up_started = False
+        self.warm_up_finished = False
+
+    def register(self, name: str, loader: Callable, required: bool = True, shareable: bool = False) -> LazyResource:
+        resource = LazyResource(name, loader, required, shareable)
+        self.resources[name] = resource
+        return resource
+
+    def get(self, name: str):
+        return self.resources[name].get()
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Load resources on worker threads so the event loop keeps serving meanwhile"""
+        self.warm_up_started = True
+        names = list(names) if names is not None else [
+            name for name, resource in self.resources.items() if resource.required
+        ]
+        for name in names:
+            try:
+                await asyncio.to_thread(self.resources[name].get)
+            except Exception as e:
+                logger.warning(f"Warm-up of {name} failed: {str(e)}")
+        self.warm_up_finished = True
+
+    def preload_shareable(self):
+        """Load shareable resources synchronously, before workers are forked"""
+        for name, resource in self.resources.items():
+            if resource.shareable:
+                try:
+                    resource.get()
+                except Exception as e:
+                    logger.warning(f"Preload of {name} failed: {str(e)}")
+
+    @property
+    def ready(self) -> bool:
+        return all(resource.loaded for resource in self.resources.values() if resource.required)
+
+    def status(self) -> dict:
+        return {name: resource.status() for name, resource in self.resources.items()}
+
+
+registry = ResourceRegistry()
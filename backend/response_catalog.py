@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Placeholder used in templated responses. Digits survive machine translation
+# intact, so the translated template can be filled in per request.
+TIME_PLACEHOLDER = "99:99"
+
+# English response variants per intent
+RESPONSE_VARIANTS = {
+    'time': [f"The current time is {TIME_PLACEHOLDER}"],
+    'joke': [
+        "Why don't scientists trust atoms? Because they make up everything!",
+        "Why did the scarecrow win an award? He was outstanding in his field!",
+        "Why don't eggs tell jokes? They'd crack each other up!",
+        "What do you call a fake noodle? An impasta!",
+        "Why did the math book look so sad? Because it had too many problems!"
+    ],
+    'greeting': ["Hello! I'm your multilingual voice assistant. How can I help you today?"],
+    'translate': ["Please provide the text you want me to translate."],
+    'general': ["I understand you're asking something. Could you please be more specific about what you need help with?"],
+}
+
+TEMPLATED_INTENTS = {'time'}
+
+
+class ResponseCatalog:
+    """Pre-localized response texts for every (intent, variant, language), persisted to disk.
+
+    Translations are keyed by their English source text, so editing a variant
+    simply leaves the old translation unused and the next build fills it in.
+    """
+
+    def __init__(self, path, variants: Dict[str, List[str]] = RESPONSE_VARIANTS, source_language: str = 'en'):
+        self.path = Path(path)
+        self.variants = variants
+        self.source_language = source_language
+        self.translations = {}
+        self.ready = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as catalog_file:
+                self.translations = json.load(catalog_file).get('translations', {})
+        except FileNotFoundError:
+            self.translations = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response catalog {self.path}: {str(e)}")
+            self.translations = {}
+
+    def save(self):
+        with self._lock:
+            payload = {'version': 1, 'translations': self.translations}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as catalog_file:
+            json.dump(payload, catalog_file, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def choose_variant(self, intent: str) -> int:
+        return random.randrange(len(self.variants.get(intent, self.variants['general'])))
+
+    def source_text(self, intent: str, variant: int) -> str:
+        return self.variants.get(intent, self.variants['general'])[variant]
+
+    def render(self, intent: str, variant: int, language: str, now: Optional[datetime] = None) -> Optional[str]:
+        """Localized response text, or None when the catalog has no usable entry yet"""
+        if intent not in self.variants:
+            intent = 'general'
+        source = self.source_text(intent, variant)
+        if language == self.source_language:
+            text = source
+        else:
+            text = self.translations.get(language, {}).get(source)
+            if text is None:
+                return None
+        if intent in TEMPLATED_INTENTS:
+            text = text.replace(TIME_PLACEHOLDER, (now or datetime.now()).strftime('%I:%M %p'))
+        return text
+
+    def missing(self, languages) -> List[tuple]:
+        """(language, source text) pairs that still need translating"""
+        pending = []
+        for language in languages:
+            if language == self.source_language:
+                continue
+            known = self.translations.get(language, {})
+            for texts in self.variants.values():
+                pending.extend((language, text) for text in texts if text not in known)
+        return pending
+
+    def add(self, language: str, source: str, translated: str) -> bool:
+        if source in self.variants['time'] and TIME_PLACEHOLDER not in translated:
+            # The placeholder did not survive translation; keep translating per request
+            return False
+        with self._lock:
+            self.translations.setdefault(language, {})[source] = translated
+        return True
+
+    def static_entries(self, languages):
+        """(text, language) pairs whose audio never changes, for pre-synthesis"""
+        for language in languages:
+            for intent, texts in self.variants.items():
+                if intent in TEMPLATED_INTENTS:
+                    continue
+                for variant in range(len(texts)):
+                    text = self.render(intent, variant, language)
+                    if text is not None:
+                        yield text, language
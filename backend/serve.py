@@ -0,0 +1,288 @@
+"""Pre-forking launcher: load shared read-only state once, then fork uvicorn workers.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8001
+
+The parent imports the app, loads the intent tables, language lookups,
+response catalog and shareable models, freezes them out of the garbage
+collector's reach (so collections in the workers do not touch, and copy,
+those pages) and forks the workers. Every worker has its own event loop,
+Mongo client, thread pools and caches, and all of them accept on one
+listening socket bound by the parent.
+
+Signals to the parent: TERM/INT stop all workers gracefully, HUP reloads the
+shared state and replaces the workers one at a time, starting each
+replacement and waiting until it serves before stopping the old worker.
+Workers that die are restarted with a backoff.
+
+Metrics are per process, so /metrics on the shared port answers from
+whichever worker accepts the scrape. With --metrics-port P, worker i also
+serves its own metrics on port P + i; scrape those instead.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def serve_metrics(reader, writer):
+    """Answer any HTTP request with this worker's metrics in the Prometheus text format"""
+    from metrics import registry
+
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = registry.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the parent over a pipe once startup has finished.
+
+    Also serves the worker's metrics on metrics_sock, if given.
+    """
+
+    def __init__(self, config, ready_fd: int, metrics_sock: socket.socket = None):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+        self.metrics_sock = metrics_sock
+        self.metrics_server = None
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started and self.metrics_sock is not None:
+            self.metrics_server = await asyncio.start_server(serve_metrics, sock=self.metrics_sock)
+        if self.started:
+            os.write(self.ready_fd, b'1')
+        os.close(self.ready_fd)
+
+    async def shutdown(self, sockets=None):
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        await super().shutdown(sockets=sockets)
+
+
+class Arbiter:
+    """Forks, supervises and restarts uvicorn workers sharing one socket"""
+
+    def __init__(self, app, sock: socket.socket, args, metrics_socks=()):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.metrics_socks = list(metrics_socks)  # one per worker index
+        self.workers = {}  # pid -> worker index
+        self.restarts = 0
+        self._stopping = False
+        self._reload = False
+
+    def spawn(self, index: int):
+        """Fork worker number index; returns (pid, read end of its readiness pipe)"""
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            status = 1
+            try:
+                self._run_worker(index, ready_write)
+                status = 0
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+            finally:
+                os._exit(status)
+        os.close(ready_write)
+        self.workers[pid] = index
+        return pid, ready_read
+
+    def _run_worker(self, index: int, ready_fd: int):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        os.environ['WORKER_INDEX'] = str(index)
+        if index != 0:
+            # One worker fills in missing catalog translations; the others pick
+            # them up from the file at the next rolling restart
+            os.environ['PREBUILD_RESPONSE_CATALOG'] = '0'
+        config = uvicorn.Config(
+            self.app,
+            log_level=self.args.log_level,
+            backlog=self.args.backlog,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            forwarded_allow_ips=self.args.forwarded_allow_ips,
+        )
+        metrics_sock = self.metrics_socks[index] if self.metrics_socks else None
+        WorkerServer(config, ready_fd, metrics_sock).run(sockets=[self.sock])
+
+    def wait_ready(self, pid: int, ready_fd: int) -> bool:
+        try:
+            readable, _, _ = select.select([ready_fd], [], [], self.args.ready_timeout)
+            return bool(readable) and os.read(ready_fd, 1) == b'1'
+        finally:
+            os.close(ready_fd)
+
+    def stop_worker(self, pid: int, sig=signal.SIGTERM):
+        """Ask a worker to finish in-flight requests and exit, killing it after the grace period"""
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done:
+                break
+            time.sleep(0.1)
+        else:
+            logger.warning(f"Worker {pid} did not stop in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.pop(pid, None)
+
+    def rolling_restart(self):
+        # Reload in the parent first so replacements start from current state
+        # (e.g. catalog translations written by worker 0 since the last fork)
+        import server
+        server.preload_shared_state()
+        gc.collect()
+        gc.freeze()
+        for old_pid, index in sorted(self.workers.items(), key=lambda item: item[1]):
+            if self._stopping:
+                return
+            new_pid, ready_fd = self.spawn(index)
+            if not self.wait_ready(new_pid, ready_fd):
+                logger.error(f"Replacement for worker {index} did not become ready, keeping the old one")
+                self.stop_worker(new_pid, signal.SIGKILL)
+                return
+            self.stop_worker(old_pid)
+            logger.info(f"Worker {index} replaced: {old_pid} -> {new_pid}")
+
+    def reap(self):
+        """Collect exited workers and start replacements, backing off on repeated crashes"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is None or self._stopping:
+                continue
+            logger.warning(f"Worker {index} ({pid}) exited with status {status}, restarting")
+            self.restarts += 1
+            time.sleep(min(self.args.max_restart_delay, 0.5 * 2 ** min(self.restarts, 6)))
+            self.spawn_ready(index)
+
+    def spawn_ready(self, index: int):
+        pid, ready_fd = self.spawn(index)
+        if self.wait_ready(pid, ready_fd):
+            self.restarts = 0
+        else:
+            logger.error(f"Worker {index} ({pid}) did not become ready within {self.args.ready_timeout}s")
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for index in range(self.args.workers):
+            self.spawn_ready(index)
+        logger.info(
+            f"Serving on {self.args.host}:{self.args.port} with {len(self.workers)} workers "
+            f"(parent {os.getpid()})"
+        )
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                logger.info("Rolling restart requested")
+                self.rolling_restart()
+            self.reap()
+            time.sleep(0.2)
+
+        logger.info("Stopping workers")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8001)))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="seconds a stopping worker may spend finishing in-flight requests")
+    parser.add_argument("--ready-timeout", type=float, default=60,
+                        help="seconds a new worker may take to finish startup")
+    parser.add_argument("--max-restart-delay", type=float, default=30)
+    parser.add_argument("--forwarded-allow-ips", default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+                        help="comma separated proxy addresses trusted to set X-Forwarded-For/-Proto, or '*'")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0)),
+                        help="serve worker i's metrics on this port + i (0: off)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # PASSWORD_HASH_WORKERS is the bcrypt process budget for the whole server;
+    # each worker starts its own pool, so split it between them
+    hash_workers = int(os.environ.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(max(1, hash_workers // args.workers) if hash_workers else 0)
+    started = time.perf_counter()
+    import server
+    server.preload_shared_state()
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Shared state loaded in {time.perf_counter() - started:.2f}s")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    metrics_socks = []
+    if args.metrics_port:
+        # Bound here so a replacement worker takes over its predecessor's metrics port
+        metrics_socks = [bind_socket(args.host, args.metrics_port + index, 64) for index in range(args.workers)]
+    Arbiter(server.app, sock, args, metrics_socks).run()
+
+
+if __name__ == "__main__":
+    main()
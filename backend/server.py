@@ -1,59 +1,160 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
-from passlib.context import CryptContext
 import io
-import speech_recognition as sr
-from gtts import gTTS
-import tempfile
+import asyncio
+import base64
 import json
 import re
-from googletrans import Translator, LANGUAGES
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import spacy
-import random
+import zlib
+from dispatch import backends
+from tts_cache import TTSCache
+from intents import intent_matcher
+from auth_cache import UserCache
+from history_writer import HistoryWriter
+from usage_rollups import UsageRollups, day_range
+from response_catalog import ResponseCatalog
+from translation_cache import TranslationCache, translation_text
+import lang_detect
+from nlp import TextNormalizer, BatchNormalizer
+from resources import registry as resources
+import providers
+import audio
+from passwords import PasswordHasher
+from admission import AdmissionController, AdmissionMiddleware, create_bucket_store, HIGH, NORMAL, LOW
+from resilience import DeadlineMiddleware, can_degrade, mark_degraded, degraded_features, track_degradation
+from metrics import registry as metrics_registry, stage, MetricsMiddleware, EventLoopMonitor, AUDIO_BYTES, WEBSOCKET_SESSIONS
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened per process by connect_database() at startup so
+# that pre-forked workers (serve.py) never share a client created before fork
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
+db = None
+
+# Daily usage counters per (user, day, intent, languages), incremented as
+# history batches are written and read by /api/analytics/usage
+usage_rollups = UsageRollups()
+
+# Background batching writer for voice command history; its collection is
+# attached once the database is connected
+history_writer = HistoryWriter(
+    None,
+    max_batch=int(os.environ.get('HISTORY_BATCH_SIZE', 100)),
+    flush_interval=float(os.environ.get('HISTORY_FLUSH_INTERVAL', 0.5)),
+    max_queue=int(os.environ.get('HISTORY_MAX_QUEUE', 10000)),
+    overflow=os.environ.get('HISTORY_OVERFLOW', 'block'),
+    rollups=usage_rollups,
+    max_retries=int(os.environ.get('HISTORY_MAX_RETRIES', 3)),
+)
 
 # Security setup
 SECRET_KEY = "your-secret-key-change-in-production"  # Change this in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Upload limits for audio files
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# Largest page of command history returned in one request
+MAX_HISTORY_PAGE = 200
+
+# History export: documents per Mongo cursor batch, and bytes buffered before
+# a chunk is sent (the first document is always sent on its own, right away)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Users allowed to read usage analytics across all users (comma-separated emails)
+ANALYTICS_ADMINS = {email.strip().lower() for email in os.environ.get('ANALYTICS_ADMINS', '').split(',') if email.strip()}
+
+# Decode, downmix, resample and trim uploads before recognition (see audio.py)
+AUDIO_PREPROCESSING = os.environ.get('AUDIO_PREPROCESSING', '1') == '1'
+
+# Longest audio accepted in one /api/ws/voice session
+WS_MAX_SESSION_SECONDS = float(os.environ.get('WS_MAX_SESSION_SECONDS', 120))
+
+# Segments of one /api/ws/voice session recognized at once; further frames wait
+WS_MAX_INFLIGHT_SEGMENTS = int(os.environ.get('WS_MAX_INFLIGHT_SEGMENTS', 2))
+
+# Minimum script share for the local language detector to answer without a remote call
+LOCAL_DETECT_MIN_CONFIDENCE = float(os.environ.get('LOCAL_DETECT_MIN_CONFIDENCE', 0.6))
+
+# Batch translation limits
+MAX_BATCH_TEXTS = int(os.environ.get('MAX_BATCH_TEXTS', 500))
+MAX_BATCH_LANGUAGES = 10
+MAX_TRANSLATION_CHARS = 4500
+BATCH_TRANSLATION_CONCURRENCY = int(os.environ.get('BATCH_TRANSLATION_CONCURRENCY', 8))
+
+# bcrypt runs on its own process pool (PASSWORD_HASH_WORKERS, default one per core);
+# the work factor is set with BCRYPT_ROUNDS
+password_hasher = PasswordHasher(
+    int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+)
 security = HTTPBearer()
 
-# Download NLTK data (only needed once)
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+# Per-process cache of verified access tokens -> users
+user_cache = UserCache(
+    max_entries=int(os.environ.get('AUTH_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('AUTH_CACHE_TTL', 60)),
+)
+USER_PROJECTION = {"_id": 0, "hashed_password": 0}
 
-# Initialize translator
-translator = Translator()
+# Per-user token buckets per endpoint class (audio, translation, auth) and a
+# per-worker concurrency limit that sheds low priority requests first
+admission = AdmissionController(create_bucket_store())
 
-# Initialize speech recognizer
-recognizer = sr.Recognizer()
+# TTS audio cache (memory LRU in front of a persistent disk tier)
+tts_cache = TTSCache(
+    os.environ.get('TTS_CACHE_DIR', str(ROOT_DIR / 'tts_cache')),
+    memory_bytes=int(os.environ.get('TTS_CACHE_MEMORY_BYTES', 32 * 1024 * 1024)),
+    disk_bytes=int(os.environ.get('TTS_CACHE_DISK_BYTES', 512 * 1024 * 1024)),
+)
+
+# Pre-localized responses for every supported language, persisted across restarts
+response_catalog = ResponseCatalog(os.environ.get('RESPONSE_CATALOG_PATH', str(ROOT_DIR / 'response_catalog.json')))
+
+# Translation results cache with single-flight coalescing
+translation_cache = TranslationCache(
+    max_entries=int(os.environ.get('TRANSLATION_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('TRANSLATION_CACHE_TTL', 24 * 60 * 60)),
+)
+
+# ASR, translation and TTS providers (Google by default, local stand-ins via
+# ASR_PROVIDER / TRANSLATION_PROVIDER / TTS_PROVIDER=local). They are created
+# lazily and warmed up in the background at startup.
+asr_provider = resources.register('asr_provider', providers.create_asr_provider)
+translation_provider = resources.register('translation_provider', providers.create_translation_provider)
+tts_provider = resources.register('tts_provider', providers.create_tts_provider)
+
+# spaCy pipelines for transcript normalization, one per supported language.
+# Read-only once loaded, so serve.py loads them before forking its workers.
+text_normalizer = resources.register(
+    'text_normalizer', lambda: TextNormalizer().load(SUPPORTED_LANGUAGES), shareable=True
+)
+
+# Transcripts from concurrent requests are normalized together through nlp.pipe
+# (NLP_MAX_BATCH, NLP_BATCH_WAIT_MS) on the single-threaded 'nlp' backend
+nlp_batcher = BatchNormalizer(
+    lambda texts, language: text_normalizer.get().normalize_batch(texts, language),
+    run_batch=lambda func, *args: backends.run('nlp', func, *args),
+)
 
 # Create the main app without a prefix
 app = FastAPI(title="Multilingual Voice Assistant", description="A voice assistant supporting multiple Indian languages")
@@ -69,6 +170,13 @@ class User(BaseModel):
     hashed_password: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CurrentUser(BaseModel):
+    """Request-scoped view of a user, loaded without the password hash"""
+    id: str
+    username: str
+    email: str
+    created_at: datetime
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -99,17 +207,28 @@ class VoiceResponse(BaseModel):
     response_text: str
     target_language: str
     audio_url: Optional[str] = None
+    degraded: List[str] = []
+
+class VoiceTurnResponse(VoiceResponse):
+    confidence: float
+    audio_base64: Optional[str] = None
 
 class TranslationRequest(BaseModel):
     text: str
     target_language: str
 
+class BatchTranslationRequest(BaseModel):
+    texts: List[str]
+    target_languages: List[str]
+    source_language: str = "auto"
+
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """Returns (valid, new hash if the stored one uses an outdated work factor)"""
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -122,66 +241,230 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+def admit(endpoint_class: str, priority: str):
+    """Route dependency: the user's rate limit for endpoint_class, then a concurrency slot at priority"""
+    async def dependency(current_user: CurrentUser = Depends(get_current_user)):
+        await admission.admit(endpoint_class, priority, current_user.id)
+    return dependency
+
+def admit_client(endpoint_class: str, priority: str):
+    """admit() for routes without a user, keyed by the client address and the submitted email.
+
+    The address is the real client's only when the proxy in front of the app
+    is trusted to set X-Forwarded-For (FORWARDED_ALLOW_IPS, see serve.py);
+    the email keeps users behind one address from sharing a single bucket.
+    """
+    async def dependency(request: Request):
+        address = request.client.host if request.client else "unknown"
+        try:
+            # Already read and cached by FastAPI for the route's body parameter
+            email = (await request.json()).get("email")
+        except Exception:
+            email = None
+        key = f"{address}:{email.strip().lower()}" if isinstance(email, str) else address
+        await admission.admit(endpoint_class, priority, key)
+    return dependency
+
+async def authenticate_token(token: str):
+    """Resolve an access token to the current user, raising 401 if it is invalid"""
+    cached_user = user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user = await db.users.find_one({"email": email})
+    with stage('mongo_users'):
+        user = await db.users.find_one({"email": email}, USER_PROJECTION)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return User(**user)
-
-def detect_intent(text):
-    """Simple intent detection based on keywords"""
-    text = text.lower()
-    
-    # Time-related intents
-    time_keywords = ['time', 'clock', 'what time', 'current time', 'samay', 'waqt', 'కాలం', 'நேரம்', 'സമയം']
-    if any(keyword in text for keyword in time_keywords):
-        return 'time'
-    
-    # Joke intents
-    joke_keywords = ['joke', 'funny', 'humor', 'laugh', 'हंसी', 'मज़ाक', 'హాస్యం', 'நகைச்சுवை', 'തമാശ']
-    if any(keyword in text for keyword in joke_keywords):
-        return 'joke'
-    
-    # Greeting intents
-    greeting_keywords = ['hello', 'hi', 'hey', 'good morning', 'good evening', 'namaste', 'नमस्ते', 'वणक्कम्', 'നമസ്കാരം']
-    if any(keyword in text for keyword in greeting_keywords):
-        return 'greeting'
-    
-    # Translation intents
-    translate_keywords = ['translate', 'convert', 'meaning', 'अनुवाद', 'மொழிபெயர्पு', 'অনুবাদ', 'అనువాదం']
-    if any(keyword in text for keyword in translate_keywords):
-        return 'translate'
-    
-    return 'general'
-
-def generate_response(intent, detected_language='en'):
-    """Generate appropriate response based on intent"""
-    
-    jokes = [
-        "Why don't scientists trust atoms? Because they make up everything!",
-        "Why did the scarecrow win an award? He was outstanding in his field!",
-        "Why don't eggs tell jokes? They'd crack each other up!",
-        "What do you call a fake noodle? An impasta!",
-        "Why did the math book look so sad? Because it had too many problems!"
-    ]
-    
-    responses = {
-        'time': f"The current time is {datetime.now().strftime('%I:%M %p')}",
-        'joke': random.choice(jokes),
-        'greeting': "Hello! I'm your multilingual voice assistant. How can I help you today?",
-        'translate': "Please provide the text you want me to translate.",
-        'general': "I understand you're asking something. Could you please be more specific about what you need help with?"
-    }
+    current_user = CurrentUser(**user)
+    user_cache.put(token, email, current_user, exp=payload.get("exp"))
+    return current_user
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload in bounded chunks, rejecting it as soon as it exceeds max_bytes"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Audio file too large (limit {max_bytes} bytes)")
+        buffer.extend(chunk)
+    AUDIO_BYTES.observe(len(buffer), direction='upload')
+    return bytes(buffer)
+
+def prepare_audio(audio_data: bytes, filename: Optional[str] = None):
+    """Turn an upload into trimmed 16 kHz mono WAV, rejecting undecodable or silent audio"""
+    try:
+        prepared = audio.preprocess(audio_data, filename)
+    except audio.AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode audio: {str(e)}")
+    if not prepared.speech_found:
+        raise HTTPException(status_code=400, detail="No speech detected in audio")
+    return prepared
+
+def transcribe_audio(audio_data: bytes):
+    """Transcribe the whole audio clip with the configured ASR provider"""
+    return asr_provider.get().transcribe(audio_data)
+
+def translate_sync(text, dest, src='auto'):
+    return translation_provider.get().translate(text, dest, src)
+
+def detect_sync(text):
+    return translation_provider.get().detect(text)
+
+def start_speech_stream(text, language, slow=False):
+    """Return a generator yielding audio bytes per sentence-sized part"""
+    return tts_provider.get().stream(text, language, slow)
+
+def speech_cache_key(text, language, slow=False):
+    provider = tts_provider.get()
+    return TTSCache.make_key(text, language, slow, voice='' if provider.name == 'google' else provider.name)
+
+def synthesize_speech(text, language, slow=False):
+    """Synthesize text with the configured TTS provider and return the audio bytes"""
+    return tts_provider.get().synthesize(text, language, slow)
+
+def load_or_synthesize_speech(key, text, language, slow=False):
+    """Serve audio from the disk tier, synthesizing and caching it on a miss"""
+    audio_data = tts_cache.get(key)
+    if audio_data is None:
+        audio_data = synthesize_speech(text, language, slow)
+        tts_cache.put(key, audio_data)
+    return audio_data
+
+async def get_speech_audio(text, language, slow=False):
+    """Return audio bytes for text, answering memory hits without leaving the event loop"""
+    key = speech_cache_key(text, language, slow)
+    audio_data = tts_cache.get_memory(key)
+    if audio_data is None:
+        audio_data = await backends.run('tts', load_or_synthesize_speech, key, text, language, slow)
+    AUDIO_BYTES.observe(len(audio_data), direction='tts')
+    return audio_data
+
+async def cached_translate(text, dest, src='auto'):
+    """Translate through the shared cache, coalescing identical in-flight requests"""
+    return await translation_cache.get_or_translate(
+        text, dest, src,
+        lambda: backends.run('translate', translate_sync, text, dest, src),
+    )
+
+def split_for_translation(text, limit=MAX_TRANSLATION_CHARS):
+    """Split text into chunks under the provider's size limit, preferring sentence then word boundaries"""
+    if len(text) <= limit:
+        return [text]
+    
+    chunks = []
+    current = ""
+    for piece in re.split(r"(?<=[.!?।॥])\s+", text):
+        while len(piece) > limit:
+            cut = piece.rfind(" ", 0, limit)
+            if cut <= 0:
+                cut = limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(piece[:cut])
+            piece = piece[cut:].lstrip()
+        if current and len(current) + 1 + len(piece) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def parse_byte_range(range_header, size):
+    """Parse a single 'bytes=start-end' range into inclusive offsets.
+
+    Returns None when the header should be ignored (malformed or multi-range)
+    and raises ValueError when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+def cached_audio_response(request: Request, audio_data: bytes, etag: str):
+    """Serve cached MP3 bytes honouring If-None-Match, Range and If-Range"""
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, max-age=86400"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        size = len(audio_data)
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                audio_data[start:end + 1],
+                status_code=206,
+                media_type=tts_provider.get().content_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
     
-    return responses.get(intent, responses['general'])
+    return Response(audio_data, media_type=tts_provider.get().content_type, headers=headers)
+
+async def stream_synthesized_audio(key, chunks, first_chunk):
+    """Yield gTTS parts as they are synthesized and cache the full MP3 once complete"""
+    parts = [first_chunk]
+    yield first_chunk
+    try:
+        while True:
+            chunk = await backends.run('tts', next, chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        # Headers are already sent; re-raising aborts the chunked response so
+        # the client sees a failed transfer instead of a short, complete-looking MP3
+        logger.warning(f"TTS stream aborted: {str(e)}")
+        raise
+    audio_data = b"".join(parts)
+    AUDIO_BYTES.observe(len(audio_data), direction='tts')
+    await backends.run('tts', tts_cache.put, key, audio_data)
+
+def detect_intent(text, normalized=None):
+    """Keyword intent detection using the compiled matcher from intents.py.
+
+    The normalized (lemmatized, stop word free) tokens are matched first; the
+    raw text is the fallback, since dropping stop words can break up a
+    multi-word keyword.
+    """
+    if normalized is not None and normalized.tokens:
+        intent = intent_matcher.classify(normalized.text)
+        if intent != intent_matcher.default:
+            return intent
+    return intent_matcher.classify(text)
 
 # Language mapping for translation
 SUPPORTED_LANGUAGES = {
@@ -193,41 +476,211 @@ SUPPORTED_LANGUAGES = {
     'ml': 'malayalam'
 }
 
+# Voice pipeline helpers
+async def recognize_speech(audio_data, filename=None):
+    """Transcribe audio and detect its language, returning (text, language, confidence)"""
+    if AUDIO_PREPROCESSING:
+        prepared = await backends.run('audio', prepare_audio, audio_data, filename)
+        audio_data = prepared.wav
+        AUDIO_BYTES.observe(len(audio_data), direction='asr')
+    text = await backends.run('asr', transcribe_audio, audio_data)
+    detected_language, confidence = await detect_language(text)
+    return text, detected_language, confidence
+
+async def detect_language(text):
+    """Detect the language by script locally, asking the remote detector only for ambiguous or romanized text"""
+    local = lang_detect.detect_language(text, LOCAL_DETECT_MIN_CONFIDENCE)
+    if local is not None:
+        return local.language, local.confidence
+    try:
+        detected = await backends.run('detect', detect_sync, text)
+    except Exception as e:
+        if not can_degrade(e):
+            raise
+        logger.warning(f"Language detection unavailable, assuming English: {getattr(e, 'detail', e)}")
+        mark_degraded('language_detection')
+        return 'en', 0.0
+    detected_language = detected.lang if detected.lang in SUPPORTED_LANGUAGES else 'en'
+    return detected_language, getattr(detected, 'confidence', 0.5)
+
+async def normalize_utterance(text, language):
+    """Tokens of a transcript without stop words, lemmatized where a model exists; None if NLP is failing"""
+    try:
+        return await nlp_batcher.normalize(text, language)
+    except Exception as e:
+        if not can_degrade(e):
+            raise
+        logger.warning(f"Text normalization unavailable, matching intents on raw text: {getattr(e, 'detail', e)}")
+        mark_degraded('nlp')
+        return None
+
+async def answer_text(transcribed_text, detected_language, target_language):
+    """Detect the intent and build the response, translated if the target language differs"""
+    normalized = await normalize_utterance(transcribed_text, detected_language)
+    intent = detect_intent(transcribed_text, normalized)
+    variant = response_catalog.choose_variant(intent)
+    response_text = response_catalog.render(intent, variant, 'en')
+    if target_language != detected_language:
+        localized = response_catalog.render(intent, variant, target_language)
+        if localized is not None:
+            response_text = localized
+        else:
+            try:
+                translated = await cached_translate(response_text, target_language)
+                response_text = translated.text
+            except Exception as e:
+                if not can_degrade(e):
+                    raise
+                # Answer in English rather than not at all
+                logger.warning(f"Translation unavailable, answering in English: {getattr(e, 'detail', e)}")
+                mark_degraded('translation')
+    return intent, response_text
+
+async def speech_audio_or_none(text, language):
+    """Synthesized audio for a voice response, or None (marking the response degraded) if TTS is failing"""
+    try:
+        return await get_speech_audio(text, language)
+    except Exception as e:
+        if not can_degrade(e):
+            raise
+        logger.warning(f"TTS unavailable, answering without audio: {getattr(e, 'detail', e)}")
+        mark_degraded('tts')
+        return None
+
+async def build_response_catalog():
+    """Translate and pre-synthesize every catalog entry still missing for SUPPORTED_LANGUAGES"""
+    added = 0
+    for language, source in response_catalog.missing(SUPPORTED_LANGUAGES):
+        try:
+            translated = await backends.run('translate', translate_sync, source, language)
+        except Exception as e:
+            logger.warning(f"Response catalog: could not translate to {language}: {getattr(e, 'detail', e)}")
+            continue
+        if response_catalog.add(language, source, translated.text):
+            added += 1
+    if added:
+        await asyncio.to_thread(response_catalog.save)
+    
+    for text, language in response_catalog.static_entries(SUPPORTED_LANGUAGES):
+        try:
+            await get_speech_audio(text, language)
+        except Exception as e:
+            logger.warning(f"Response catalog: could not synthesize {language} audio: {getattr(e, 'detail', e)}")
+    
+    response_catalog.ready = True
+    logger.info(f"Response catalog ready ({added} new translations)")
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def ndjson_line(event):
+    return (json.dumps(event, ensure_ascii=False, default=json_default) + "\n").encode("utf-8")
+
+async def voice_turn_events(audio_data, filename, target_language, include_audio, current_user):
+    """NDJSON events for one voice turn, each emitted as soon as its stage finishes"""
+    try:
+        transcribed_text, detected_language, confidence = await recognize_speech(audio_data, filename)
+        yield ndjson_line({
+            "event": "transcript",
+            "transcribed_text": transcribed_text,
+            "detected_language": detected_language,
+            "confidence": confidence,
+        })
+        
+        intent, response_text = await answer_text(transcribed_text, detected_language, target_language)
+        yield ndjson_line({
+            "event": "response",
+            "intent": intent,
+            "response_text": response_text,
+            "target_language": target_language,
+        })
+        
+        command = VoiceCommand(
+            user_id=current_user.id,
+            transcribed_text=transcribed_text,
+            detected_language=detected_language,
+            intent=intent,
+            response_text=response_text,
+            target_language=target_language
+        )
+        save = asyncio.create_task(history_writer.submit(command.dict()))
+        if include_audio:
+            audio_data = await speech_audio_or_none(response_text, target_language)
+            if audio_data is not None:
+                yield ndjson_line({
+                    "event": "audio",
+                    "content_type": tts_provider.get().content_type,
+                    "audio_base64": base64.b64encode(audio_data).decode("ascii"),
+                })
+        await save
+        yield ndjson_line({"event": "done", "degraded": degraded_features()})
+    
+    except HTTPException as e:
+        yield ndjson_line({"event": "error", "status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        yield ndjson_line({"event": "error", "status_code": 400, "detail": f"Voice turn failed: {str(e)}"})
+
 # Authentication routes
-@api_router.post("/register", response_model=dict)
+@api_router.post("/register", response_model=dict, dependencies=[Depends(admit_client('auth', NORMAL))])
 async def register(user: UserCreate):
     # Check if user already exists
-    existing_user = await db.users.find_one({"email": user.email})
+    with stage('mongo_users'):
+        existing_user = await db.users.find_one({"email": user.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Check if username exists
-    existing_username = await db.users.find_one({"username": user.username})
+    with stage('mongo_users'):
+        existing_username = await db.users.find_one({"username": user.username})
     if existing_username:
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    with stage('password_hash'):
+        hashed_password = await get_password_hash(user.password)
     user_obj = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     
-    await db.users.insert_one(user_obj.dict())
+    try:
+        with stage('mongo_users'):
+            await db.users.insert_one(user_obj.dict())
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration; the unique indexes decide
+        raise HTTPException(status_code=400, detail="Email or username already registered")
+    user_cache.invalidate_user(user_obj.email)
     
     return {"message": "User registered successfully"}
 
-@api_router.post("/login", response_model=Token)
+@api_router.post("/login", response_model=Token, dependencies=[Depends(admit_client('auth', NORMAL))])
 async def login(user: UserLogin):
-    db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    with stage('mongo_users'):
+        db_user = await db.users.find_one({"email": user.email})
+    if db_user:
+        with stage('password_verify'):
+            password_ok, new_hash = await verify_password(user.password, db_user["hashed_password"])
+    if not db_user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this password was stored; upgrade it in place
+        try:
+            with stage('mongo_users'):
+                await db.users.update_one(
+                    {"email": db_user["email"], "hashed_password": db_user["hashed_password"]},
+                    {"$set": {"hashed_password": new_hash}},
+                )
+        except Exception as e:
+            logger.warning(f"Could not rehash password for {db_user['email']}: {str(e)}")
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": db_user["email"]}, expires_delta=access_token_expires
@@ -235,85 +688,95 @@ async def login(user: UserLogin):
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Voice processing routes
-@api_router.post("/speech-to-text", response_model=dict)
-async def speech_to_text(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+@api_router.post("/speech-to-text", response_model=dict, dependencies=[Depends(admit('audio', NORMAL))])
+async def speech_to_text(file: UploadFile = File(...), current_user: CurrentUser = Depends(get_current_user)):
     try:
         # Read the uploaded audio file
-        audio_data = await file.read()
-        
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            temp_file.write(audio_data)
-            temp_filename = temp_file.name
+        audio_data = await read_upload(file)
         
         try:
-            # Use speech recognition
-            with sr.AudioFile(temp_filename) as source:
-                audio = recognizer.record(source)
-                text = recognizer.recognize_google(audio)
-            
-            # Detect language
-            detected = translator.detect(text)
-            detected_language = detected.lang if detected.lang in SUPPORTED_LANGUAGES else 'en'
-            
-            # Clean up temp file
-            os.unlink(temp_filename)
+            # Use speech recognition and detect the language
+            text, detected_language, confidence = await recognize_speech(audio_data, file.filename)
             
             return {
                 "transcribed_text": text,
                 "detected_language": detected_language,
-                "confidence": getattr(detected, 'confidence', 0.5)
+                "confidence": confidence
             }
         
+        except HTTPException:
+            raise
         except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists(temp_filename):
-                os.unlink(temp_filename)
             raise HTTPException(status_code=400, detail=f"Speech recognition failed: {str(e)}")
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing audio: {str(e)}")
 
-@api_router.post("/text-to-speech")
-async def text_to_speech(text: str, language: str = "en", current_user: User = Depends(get_current_user)):
+@api_router.post("/text-to-speech", dependencies=[Depends(admit('audio', NORMAL))])
+async def text_to_speech(text: str, language: str = "en", slow: bool = False, current_user: CurrentUser = Depends(get_current_user)):
     try:
-        # Create TTS
-        tts = gTTS(text=text, lang=language, slow=False)
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-            tts.save(temp_file.name)
-            
-            # Read the file and return as bytes
-            with open(temp_file.name, "rb") as audio_file:
-                audio_data = audio_file.read()
-            
-            # Clean up
-            os.unlink(temp_file.name)
-            
+        audio_data = await get_speech_audio(text, language, slow)
         return {"audio_data": audio_data.hex(), "message": "TTS conversion successful"}
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"TTS conversion failed: {str(e)}")
+
+@api_router.api_route("/text-to-speech/stream", methods=["GET", "POST"], dependencies=[Depends(admit('audio', NORMAL))])
+async def text_to_speech_stream(
+    request: Request,
+    text: str,
+    language: str = "en",
+    slow: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    key = speech_cache_key(text, language, slow)
+    etag = f'"{key}"'
+    
+    try:
+        # Cached audio is served whole, with Range and conditional request support
+        audio_data = tts_cache.get_memory(key)
+        if audio_data is None:
+            audio_data = await backends.run('tts', tts_cache.get, key)
+        if audio_data is not None:
+            return cached_audio_response(request, audio_data, etag)
+        
+        # Otherwise stream each sentence-sized gTTS part as soon as it is synthesized
+        chunks = await backends.run('tts', start_speech_stream, text, language, slow)
+        first_chunk = await backends.run('tts', next, chunks, None)
+        if first_chunk is None:
+            raise HTTPException(status_code=400, detail="TTS conversion failed: no audio produced")
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"TTS conversion failed: {str(e)}")
+    
+    # No validator or long max-age on the live stream: it may still fail part
+    # way. Once cached, the audio is served by cached_audio_response with both.
+    return StreamingResponse(
+        stream_synthesized_audio(key, chunks, first_chunk),
+        media_type=tts_provider.get().content_type,
+        headers={"Cache-Control": "no-store"},
+    )
 
-@api_router.post("/process-voice", response_model=VoiceResponse)
+@api_router.get("/tts/cache-stats")
+async def get_tts_cache_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return tts_cache.stats()
+
+@api_router.post("/process-voice", response_model=VoiceResponse, dependencies=[Depends(admit('audio', HIGH))])
 async def process_voice(
     transcribed_text: str,
     detected_language: str,
     target_language: str = "en",
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
-        # Detect intent
-        intent = detect_intent(transcribed_text)
-        
-        # Generate response based on intent
-        response_text = generate_response(intent, detected_language)
-        
-        # If translation is requested or target language is different, translate
-        if target_language != detected_language:
-            translated = translator.translate(response_text, dest=target_language)
-            response_text = translated.text
+        # Detect intent and generate the response, translated if the target language differs
+        intent, response_text = await answer_text(transcribed_text, detected_language, target_language)
         
         # Save command history
         command = VoiceCommand(
@@ -325,40 +788,480 @@ async def process_voice(
             target_language=target_language
         )
         
-        await db.voice_commands.insert_one(command.dict())
+        await history_writer.submit(command.dict())
         
         return VoiceResponse(
             transcribed_text=transcribed_text,
             detected_language=detected_language,
             intent=intent,
             response_text=response_text,
-            target_language=target_language
+            target_language=target_language,
+            degraded=degraded_features()
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Voice processing failed: {str(e)}")
 
-@api_router.post("/translate", response_model=dict)
-async def translate_text(request: TranslationRequest, current_user: User = Depends(get_current_user)):
+@api_router.post("/voice-turn", response_model=VoiceTurnResponse, dependencies=[Depends(admit('audio', HIGH))])
+async def voice_turn(
+    file: UploadFile = File(...),
+    target_language: str = "en",
+    include_audio: bool = True,
+    stream: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Speech-to-text, intent, response, translation and TTS in a single request"""
+    audio_data = await read_upload(file)
+    
+    if stream:
+        return StreamingResponse(
+            voice_turn_events(audio_data, file.filename, target_language, include_audio, current_user),
+            media_type="application/x-ndjson",
+        )
+    
+    try:
+        transcribed_text, detected_language, confidence = await recognize_speech(audio_data, file.filename)
+        intent, response_text = await answer_text(transcribed_text, detected_language, target_language)
+        
+        command = VoiceCommand(
+            user_id=current_user.id,
+            transcribed_text=transcribed_text,
+            detected_language=detected_language,
+            intent=intent,
+            response_text=response_text,
+            target_language=target_language
+        )
+        
+        # Save history while the response is being synthesized
+        audio_base64 = None
+        if include_audio:
+            _, response_audio = await asyncio.gather(
+                history_writer.submit(command.dict()),
+                speech_audio_or_none(response_text, target_language),
+            )
+            if response_audio is not None:
+                audio_base64 = base64.b64encode(response_audio).decode("ascii")
+        else:
+            await history_writer.submit(command.dict())
+        
+        return VoiceTurnResponse(
+            transcribed_text=transcribed_text,
+            detected_language=detected_language,
+            confidence=confidence,
+            intent=intent,
+            response_text=response_text,
+            target_language=target_language,
+            audio_base64=audio_base64,
+            degraded=degraded_features()
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Voice turn failed: {str(e)}")
+
+@api_router.websocket("/ws/voice")
+async def voice_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    target_language: str = "en",
+    sample_rate: int = 16000,
+    include_audio: bool = False
+):
+    """Streaming voice turn: 16-bit mono PCM frames in, per-segment partial results out.
+
+    The client sends binary PCM frames (little-endian int16 at sample_rate)
+    as they are captured and a {"type": "stop"} text message when the user is
+    done. Speech is cut into segments at pauses and each segment is recognized
+    while the user keeps talking, producing "segment" and "partial" events.
+    After stop, the remaining speech is recognized and a "final" event carries
+    the combined transcript, intent and response. Authenticate with a token
+    query parameter or an Authorization header.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    try:
+        current_user = await authenticate_token(token or "")
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if sample_rate < 8000 or sample_rate > 48000:
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+        return
     try:
-        translated = translator.translate(request.text, dest=request.target_language)
+        # A session holds one concurrency slot for its whole lifetime
+        await admission.check_rate('audio', current_user.id)
+        slots = admission.hold('audio', NORMAL)
+    except HTTPException:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    
+    try:
+        await websocket.accept()
+    except Exception:
+        admission.release(slots)
+        raise
+    WEBSOCKET_SESSIONS.inc()
+    segmenter = audio.StreamingSegmenter()
+    resampler = audio.StreamingResampler(sample_rate)
+    send_lock = asyncio.Lock()
+    transcripts = {}
+    tasks = []
+    recognition_slots = asyncio.Semaphore(WS_MAX_INFLIGHT_SEGMENTS)
+    received_seconds = 0.0
+    
+    async def send(event):
+        async with send_lock:
+            await websocket.send_json(event)
+    
+    async def recognize_segment(segment):
+        timing = {"segment": segment.index, "start": round(segment.start, 2), "end": round(segment.end, 2)}
+        try:
+            await send({"type": "segment", **timing})
+            wav = audio.encode_wav(audio.normalize_gain(segment.samples))
+            AUDIO_BYTES.observe(len(wav), direction='asr')
+            text = await backends.run('asr', transcribe_audio, wav)
+            detected_language, confidence = await detect_language(text)
+            transcripts[segment.index] = (text, detected_language, confidence)
+            normalized = await normalize_utterance(text, detected_language)
+            await send({
+                "type": "partial",
+                **timing,
+                "transcribed_text": text,
+                "detected_language": detected_language,
+                "confidence": confidence,
+                "intent": detect_intent(text, normalized),
+            })
+        except HTTPException as e:
+            await send({"type": "error", "segment": segment.index, "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            await send({"type": "error", "segment": segment.index, "status_code": 400, "detail": f"Speech recognition failed: {str(e)}"})
+    
+    async def start_recognition(segments):
+        for segment in segments:
+            # Stop reading frames while the session has its share of ASR work in flight
+            await recognition_slots.acquire()
+            task = asyncio.create_task(recognize_segment(segment))
+            task.add_done_callback(lambda _: recognition_slots.release())
+            tasks.append(task)
+    
+    with track_degradation():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    samples = audio.pcm16_to_float(message["bytes"])
+                    received_seconds += len(samples) / sample_rate
+                    if received_seconds > WS_MAX_SESSION_SECONDS:
+                        # No final answer for a session cut short
+                        await send({"type": "error", "status_code": 413, "detail": f"Session longer than {WS_MAX_SESSION_SECONDS:g} seconds"})
+                        await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                        return
+                    AUDIO_BYTES.observe(len(message["bytes"]), direction='stream')
+                    await start_recognition(segmenter.feed(resampler.feed(samples)))
+                elif message.get("text"):
+                    try:
+                        command = json.loads(message["text"])
+                    except ValueError:
+                        command = {}
+                    if command.get("type") == "stop":
+                        break
+        
+            await start_recognition(segmenter.feed(resampler.flush()))
+            last_segment = segmenter.flush()
+            if last_segment is not None:
+                await start_recognition([last_segment])
+            await asyncio.gather(*tasks)
+        
+            recognized = [transcripts[index] for index in sorted(transcripts) if transcripts[index][0]]
+            if not recognized:
+                await send({"type": "error", "status_code": 400, "detail": "No speech detected in audio"})
+                await websocket.close()
+                return
+        
+            transcribed_text = " ".join(text for text, _, _ in recognized)
+            # The language of the longest segment speaks for the whole turn
+            _, detected_language, confidence = max(recognized, key=lambda item: len(item[0]))
+            intent, response_text = await answer_text(transcribed_text, detected_language, target_language)
+            command = VoiceCommand(
+                user_id=current_user.id,
+                transcribed_text=transcribed_text,
+                detected_language=detected_language,
+                intent=intent,
+                response_text=response_text,
+                target_language=target_language
+            )
+            await history_writer.submit(command.dict())
+        
+            response_audio = await speech_audio_or_none(response_text, target_language) if include_audio else None
+            final = VoiceTurnResponse(
+                transcribed_text=transcribed_text,
+                detected_language=detected_language,
+                confidence=confidence,
+                intent=intent,
+                response_text=response_text,
+                target_language=target_language,
+                audio_base64=base64.b64encode(response_audio).decode("ascii") if response_audio is not None else None,
+                degraded=degraded_features()
+            )
+            await send({"type": "final", **jsonable_encoder(final)})
+            await websocket.close()
+    
+        except WebSocketDisconnect:
+            pass
+        except HTTPException as e:
+            await send({"type": "error", "status_code": e.status_code, "detail": e.detail})
+            await websocket.close()
+        except Exception as e:
+            logger.error(f"Voice WebSocket session failed: {str(e)}")
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        finally:
+            for task in tasks:
+                task.cancel()
+            admission.release(slots)
+            WEBSOCKET_SESSIONS.dec()
+
+@api_router.post("/translate", response_model=dict, dependencies=[Depends(admit('translation', LOW))])
+async def translate_text(request: TranslationRequest, current_user: CurrentUser = Depends(get_current_user)):
+    try:
+        translated = await cached_translate(request.text, request.target_language)
         return {
             "original_text": request.text,
             "translated_text": translated.text,
             "source_language": translated.src,
             "target_language": request.target_language
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Translation failed: {str(e)}")
 
+def encode_history_cursor(command):
+    return f"{command['timestamp'].isoformat()},{command['id']}"
+
+def decode_history_cursor(cursor):
+    """Parse a '<timestamp>,<id>' keyset cursor"""
+    try:
+        timestamp, command_id = cursor.split(",", 1)
+        return datetime.fromisoformat(timestamp), command_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+@api_router.post("/translate/batch", response_model=dict)
+async def translate_batch(request: BatchTranslationRequest, current_user: CurrentUser = Depends(get_current_user)):
+    if not request.texts or not request.target_languages:
+        raise HTTPException(status_code=400, detail="texts and target_languages must not be empty")
+    if len(request.texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TEXTS} texts per batch")
+    if len(request.target_languages) > MAX_BATCH_LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_LANGUAGES} target languages per batch")
+    
+    target_languages = list(dict.fromkeys(request.target_languages))
+    semaphore = asyncio.Semaphore(BATCH_TRANSLATION_CONCURRENCY)
+    
+    async def translate_chunk(chunk, dest):
+        async with semaphore:
+            return await cached_translate(chunk, dest, request.source_language)
+    
+    async def translate_one(text, dest):
+        translated = await asyncio.gather(*(translate_chunk(chunk, dest) for chunk in split_for_translation(text)))
+        return " ".join(part.text for part in translated), translated[0].src
+    
+    # Translate each distinct (text, language) pair once. Texts are compared
+    # and sent as written apart from surrounding whitespace, which each result
+    # gets back, so newlines and spacing in UI strings survive translation.
+    pairs = list(dict.fromkeys(
+        (core, dest)
+        for core in map(translation_text, request.texts) if core
+        for dest in target_languages
+    ))
+    # Admitted here rather than as a route dependency: each pair that needs an
+    # outbound call costs one token, while cached or in-flight pairs are free
+    cost = sum(not translation_cache.has(core, dest, request.source_language) for core, dest in pairs)
+    await admission.admit('translation_batch', LOW, current_user.id, cost=cost)
+    pending = {pair: translate_one(*pair) for pair in pairs}
+    outcomes = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+    
+    results = []
+    for text in request.texts:
+        core = translation_text(text)
+        leading, trailing = text[:len(text) - len(text.lstrip())], text[len(text.rstrip()):]
+        item = {"text": text, "source_language": None, "translations": {}, "errors": {}}
+        for dest in target_languages:
+            if not core:
+                item["translations"][dest] = ""
+                continue
+            outcome = outcomes[(core, dest)]
+            if isinstance(outcome, Exception):
+                item["errors"][dest] = getattr(outcome, "detail", None) or str(outcome)
+            else:
+                translated, item["source_language"] = outcome
+                item["translations"][dest] = f"{leading}{translated}{trailing}"
+        results.append(item)
+    
+    return {
+        "results": results,
+        "unique_requests": len(pending),
+        "target_languages": target_languages
+    }
+
+@api_router.get("/translation/cache-stats")
+async def get_translation_cache_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return translation_cache.stats()
+
 @api_router.get("/command-history", response_model=List[VoiceCommand])
-async def get_command_history(current_user: User = Depends(get_current_user)):
-    commands = await db.voice_commands.find(
-        {"user_id": current_user.id}
-    ).sort("timestamp", -1).limit(50).to_list(50)
+async def get_command_history(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    fields: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    query = {"user_id": current_user.id}
+    if before:
+        timestamp, command_id = decode_history_cursor(before)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": command_id}},
+        ]
     
+    # Include the commands this user just made that are still in the write buffer
+    await history_writer.wait_written(current_user.id)
+    
+    projection = {"_id": 0}
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(VoiceCommand.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        # id and timestamp are always returned because the cursor is built from them
+        projection = {field: 1 for field in requested | {"id", "timestamp"}}
+        projection["_id"] = 0
+    
+    with stage('mongo_history'):
+        commands = await db.voice_commands.find(query, projection).sort(
+            [("timestamp", -1), ("id", -1)]
+        ).limit(limit).to_list(limit)
+    
+    headers = {}
+    if len(commands) == limit:
+        headers["X-Next-Cursor"] = encode_history_cursor(commands[-1])
+    
+    if fields:
+        return JSONResponse(jsonable_encoder(commands), headers=headers)
+    response.headers.update(headers)
     return [VoiceCommand(**cmd) for cmd in commands]
 
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert timezone-aware query parameters to match"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+async def export_history_lines(query):
+    """NDJSON bytes for the matching commands, oldest first, read batch by batch from a Motor cursor"""
+    cursor = db.voice_commands.find(query, {"_id": 0}).sort(
+        [("timestamp", 1), ("id", 1)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+    buffer = []
+    buffered = 0
+    sent_first = False
+    try:
+        async for command in cursor:
+            line = ndjson_line(command)
+            buffer.append(line)
+            buffered += len(line)
+            if not sent_first or buffered >= EXPORT_CHUNK_BYTES:
+                sent_first = True
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+    except Exception as e:
+        # Headers are already sent. Pass on the complete lines read so far, then
+        # abort the transfer so the client sees it is incomplete and resumes
+        # from its last complete line rather than taking it for the full export
+        logger.error(f"History export failed after a partial response: {str(e)}")
+        if buffer:
+            yield b"".join(buffer)
+        raise
+    if buffer:
+        yield b"".join(buffer)
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        # A sync flush makes every chunk decodable as soon as it arrives
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+@api_router.get("/command-history/export")
+async def export_command_history(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Stream the user's full command history as NDJSON, oldest first.
+
+    since/until bound the timestamps (since inclusive, until exclusive). To
+    resume an interrupted export, pass the '<timestamp>,<id>' of the last
+    complete line as `after`. Compressed with gzip when the client accepts it.
+    """
+    await history_writer.wait_written(current_user.id)
+    query = {"user_id": current_user.id}
+    time_range = {}
+    if since is not None:
+        time_range["$gte"] = to_naive_utc(since)
+    if until is not None:
+        time_range["$lt"] = to_naive_utc(until)
+    if time_range:
+        query["timestamp"] = time_range
+    if after:
+        timestamp, command_id = decode_history_cursor(after)
+        query["$or"] = [
+            {"timestamp": {"$gt": timestamp}},
+            {"timestamp": timestamp, "id": {"$gt": command_id}},
+        ]
+    
+    body = export_history_lines(query)
+    headers = {
+        "Content-Disposition": 'attachment; filename="command-history.ndjson"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+@api_router.get("/history/writer-stats")
+async def get_history_writer_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return history_writer.stats()
+
+@api_router.get("/analytics/usage")
+async def get_usage_analytics(
+    days: int = Query(30, ge=1, le=366),
+    all_users: bool = False,
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Command counts by day, intent and language over the last `days` UTC days, from the rollups only"""
+    if all_users and current_user.email.lower() not in ANALYTICS_ADMINS:
+        raise HTTPException(status_code=403, detail="Usage across all users is restricted to analytics admins")
+    start_day, end_day = day_range(days)
+    return await usage_rollups.usage(start_day, end_day, None if all_users else current_user.id)
+
+@api_router.get("/admission/stats")
+async def get_admission_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return admission.stats()
+
+@api_router.get("/nlp/batch-stats")
+async def get_nlp_batch_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return nlp_batcher.stats()
+
 @api_router.get("/supported-languages")
 async def get_supported_languages():
     return {
@@ -371,8 +1274,29 @@ async def get_supported_languages():
 async def root():
     return {"message": "Multilingual Voice Assistant API"}
 
+@api_router.get("/health/ready")
+async def readiness():
+    """Warm-up and dependency status; 503 until the worker can serve voice requests"""
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=1.0)
+        database = "ok"
+    except Exception as e:
+        database = f"unavailable: {str(e) or type(e).__name__}"
+    
+    ready = resources.ready and database == "ok"
+    return JSONResponse(
+        {
+            "ready": ready,
+            "warm_up_finished": resources.warm_up_finished,
+            "resources": resources.status(),
+            "database": database,
+            "response_catalog_ready": response_catalog.ready,
+        },
+        status_code=200 if ready else 503,
+    )
+
 @api_router.get("/protected")
-async def protected_route(current_user: User = Depends(get_current_user)):
+async def protected_route(current_user: CurrentUser = Depends(get_current_user)):
     return {"message": f"Hello {current_user.username}! This is a protected route."}
 
 # Include the router in the main app
@@ -384,8 +1308,18 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing", "X-Next-Cursor", "X-Degraded", "Retry-After"],
 )
 
+# Releases admission slots once a response, streamed or not, is complete
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Per-request deadline for backend calls (REQUEST_BUDGET_SECONDS / X-Request-Timeout)
+app.add_middleware(DeadlineMiddleware)
+
+# Outermost, so request timings include CORS handling and the whole streamed body
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -393,6 +1327,123 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def create_indexes():
+    # Keyset pagination over a user's history: (user_id, timestamp desc, id desc)
+    try:
+        await db.voice_commands.create_index(
+            [("user_id", 1), ("timestamp", -1), ("id", -1)], name="user_history"
+        )
+        await db.users.create_index("email", unique=True, name="unique_email")
+        await db.users.create_index("username", unique=True, name="unique_username")
+        await usage_rollups.create_indexes()
+    except Exception as e:
+        logger.error(f"Index creation failed: {str(e)}")
+
+def connect_database():
+    """Create this process's Mongo client, unless one (e.g. a test double) was set already"""
+    global client, db
+    if client is None:
+        client = AsyncIOMotorClient(mongo_url)
+    if db is None:
+        db = client[os.environ['DB_NAME']]
+    if history_writer.collection is None:
+        history_writer.collection = db.voice_commands
+    if usage_rollups.collection is None:
+        usage_rollups.collection = db.usage_rollups
+
+def preload_shared_state():
+    """Load read-only state in a pre-forking parent so workers share it copy-on-write.
+
+    Intent tables, language lookups and the response catalog are built at
+    import; this adds the resources registered as shareable. Clients and
+    thread pools are left alone and are created inside each worker.
+    """
+    response_catalog.load()
+    resources.preload_shareable()
+
+loop_monitor = EventLoopMonitor(interval=float(os.environ.get('LOOP_LAG_INTERVAL', 0.25)))
+
+def collect_component_metrics():
+    """Export the stats() of pools, caches and the history writer at scrape time"""
+    pools = backends.stats()
+    yield ('backend_in_flight', 'gauge', 'Backend calls running or queued',
+           [({'backend': name}, pool['in_flight']) for name, pool in pools.items()])
+    yield ('backend_capacity', 'gauge', 'Backend calls admitted before shedding load (workers + queue)',
+           [({'backend': name}, pool['max_workers'] + pool['max_queue']) for name, pool in pools.items()])
+    yield ('backend_circuit_open', 'gauge', 'Whether the backend circuit breaker is refusing calls (1) or not (0)',
+           [({'backend': name}, int(pool['circuit']['state'] == 'open')) for name, pool in pools.items()])
+    yield ('backend_hedged_total', 'counter', 'Backend calls that were hedged with a second attempt',
+           [({'backend': name}, pool['hedged']) for name, pool in pools.items()])
+    
+    caches = {'tts': tts_cache.stats(), 'translation': translation_cache.stats(), 'auth': user_cache.stats()}
+    yield ('cache_hits_total', 'counter', 'Cache hits (memory and disk tiers combined)',
+           [({'cache': name}, stats['hits'] + stats.get('disk_hits', 0)) for name, stats in caches.items()])
+    yield ('cache_misses_total', 'counter', 'Cache misses',
+           [({'cache': name}, stats['misses']) for name, stats in caches.items()])
+    
+    writer = history_writer.stats()
+    yield ('history_queue_depth', 'gauge', 'Voice commands waiting to be written', [({}, writer['queue_depth'])])
+    yield ('history_documents_total', 'counter', 'Voice command documents by outcome',
+           [({'outcome': outcome}, writer[outcome]) for outcome in ('written', 'dropped', 'failed')])
+    
+    yield ('admission_in_flight', 'gauge', 'Requests holding an admission slot in this worker',
+           [({}, admission.in_flight)])
+    
+    nlp_stats = nlp_batcher.stats()
+    yield ('nlp_texts_total', 'counter', 'Transcripts normalized through the micro-batcher', [({}, nlp_stats['texts'])])
+    yield ('nlp_batches_total', 'counter', 'nlp.pipe batches run', [({}, nlp_stats['batches'])])
+    yield ('event_loop_lag_max_seconds', 'gauge', 'Largest event loop lag seen by this worker',
+           [({}, loop_monitor.max_lag)])
+
+metrics_registry.add_collector(collect_component_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint; every worker process reports its own series (see serve.py --metrics-port)"""
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("startup")
+async def open_database():
+    connect_database()
+
+@app.on_event("startup")
+async def start_index_creation():
+    # Runs in the background so an unreachable database does not block worker start
+    app.state.index_task = asyncio.create_task(create_indexes())
+
+@app.on_event("startup")
+async def start_history_writer():
+    history_writer.start()
+
+@app.on_event("startup")
+async def start_nlp_batcher():
+    nlp_batcher.start()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("startup")
+async def start_warm_up():
+    if os.environ.get('WARM_UP_ON_STARTUP', '1') == '1':
+        app.state.warm_up_task = asyncio.create_task(resources.warm_up())
+        app.state.password_warm_up_task = asyncio.create_task(password_hasher.warm_up())
+
+@app.on_event("startup")
+async def start_response_catalog_build():
+    if os.environ.get('PREBUILD_RESPONSE_CATALOG', '1') == '1':
+        app.state.catalog_task = asyncio.create_task(build_response_catalog())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task_name in ('index_task', 'warm_up_task', 'password_warm_up_task', 'catalog_task'):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    loop_monitor.stop()
+    await nlp_batcher.stop()
+    await history_writer.stop()
+    if client is not None:
+        client.close()
+    backends.shutdown()
+    password_hasher.shutdown()
\ No newline at end of file
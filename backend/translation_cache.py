@@ -0,0 +1,108 @@
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+def translation_text(text: str) -> str:
+    """Canonical form of a text to translate: NFC without surrounding whitespace.
+
+    Unlike the TTS key, whitespace inside the text is kept, since newlines and
+    spacing are part of what the translation should reproduce.
+    """
+    return unicodedata.normalize("NFC", text).strip()
+
+
+class TranslationCache:
+    """LRU + TTL cache of translation results with single-flight request coalescing.
+
+    Concurrent lookups for the same (text, source, destination) share one
+    outbound call: the first caller starts it and everyone awaits the same task.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.translate_seconds = 0.0
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    @staticmethod
+    def make_key(text: str, dest: str, src: str = 'auto') -> tuple:
+        return translation_text(text), (src or 'auto').lower(), dest.lower()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key, result):
+        self._entries[key] = (result, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def has(self, text: str, dest: str, src: str = 'auto') -> bool:
+        """Whether a lookup would be answered without a new outbound call (cached or already in flight)"""
+        key = self.make_key(text, dest, src)
+        return key in self._inflight or self._get(key) is not None
+
+    async def get_or_translate(self, text: str, dest: str, src: str,
+                               translate: Callable[[], Awaitable[Any]]) -> Any:
+        key = self.make_key(text, dest, src)
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, translate))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shield so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, translate):
+        started = time.perf_counter()
+        result = await translate()
+        self.translate_seconds += time.perf_counter() - started
+        self._put(key, result)
+        return result
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark a failure as retrieved even if every waiter has gone away
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        average_seconds = self.translate_seconds / self.misses if self.misses else 0.0
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_translate_seconds": average_seconds,
+            # Every hit or coalesced request avoided one average outbound call
+            "saved_seconds": (self.hits + self.coalesced) * average_seconds,
+        }
@@ -0,0 +1,210 @@
+import contextlib
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the disk tier is then only safe within one process
+    fcntl = None
+
+# When the disk tier is over its limit, evict down to this fraction of it, so
+# the directory is not rescanned on every following write
+DISK_LOW_WATERMARK = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TTSCache:
+    """Content-addressed MP3 cache with a byte-bounded memory LRU in front of a disk tier.
+
+    The disk tier may be shared by several processes (e.g. pre-forked
+    workers): lookups go straight to the files, and the total size is kept in
+    a file in the directory, updated under an flock, so the limit holds for
+    the directory as a whole. Files are evicted least recently used first, by
+    mtime.
+    """
+
+    def __init__(self, directory, memory_bytes: int, disk_bytes: int):
+        self.directory = Path(directory)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._size_path = self.directory / ".size"
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(text: str, language: str, slow: bool = False, voice: str = "") -> str:
+        payload = f"{language}\0{int(bool(slow))}\0{normalize_text(text)}"
+        if voice:
+            # Non-default TTS providers get their own key space
+            payload = f"{voice}\0{payload}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.mp3"
+
+    @contextlib.contextmanager
+    def _locked_disk(self):
+        """Exclusive access to the disk tier's size accounting, across threads and processes"""
+        with self._disk_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.directory / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _scan_disk(self):
+        """[(mtime, path, size)] of the cached files, oldest first"""
+        entries = []
+        for path in self.directory.glob("*/*.mp3"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return sorted(entries)
+
+    def _read_disk_usage(self):
+        """(bytes, entries) on disk, as last recorded by any process"""
+        try:
+            size, entries = self._size_path.read_text().split()
+            return int(size), int(entries)
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def _write_disk_usage(self, size: int, entries: int):
+        temp_path = self._size_path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(f"{size} {entries}")
+        os.replace(temp_path, self._size_path)
+
+    def _load_disk_index(self):
+        """Recount what survived the last run, correcting any drift in the recorded usage"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._locked_disk():
+            entries = self._scan_disk()
+            self._write_disk_usage(sum(size for _, _, size in entries), len(entries))
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """Memory-only lookup, cheap enough to call directly on the event loop"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Look up memory, then disk (promoting disk hits into memory)"""
+        data = self.get_memory(key)
+        if data is not None:
+            return data
+
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            # Mark as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            data = None
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._put_memory(key, data)
+            return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        self._put_memory(key, data)
+        self._put_disk(key, data)
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= len(previous)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+                self.memory_evictions += 1
+
+    def _put_disk(self, key: str, data: bytes):
+        if len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_bytes(data)
+
+        with self._locked_disk():
+            try:
+                previous = path.stat().st_size
+            except FileNotFoundError:
+                previous = None
+            os.replace(temp_path, path)
+            size, entries = self._read_disk_usage()
+            size += len(data) - (previous or 0)
+            entries += previous is None
+            if size > self.disk_bytes:
+                size, entries = self._evict_disk(int(self.disk_bytes * DISK_LOW_WATERMARK), keep=path)
+            self._write_disk_usage(size, entries)
+
+    def _evict_disk(self, target: int, keep: Path):
+        """Delete the least recently used files until at most target bytes remain; returns (bytes, entries)"""
+        files = self._scan_disk()
+        size = sum(file_size for _, _, file_size in files)
+        entries = len(files)
+        for _, path, file_size in files:
+            if size <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            entries -= 1
+            with self._lock:
+                self.disk_evictions += 1
+        return size, entries
+
+    def stats(self) -> dict:
+        disk_bytes, disk_entries = self._read_disk_usage()
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "memory_evictions": self.memory_evictions,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
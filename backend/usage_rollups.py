@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import UpdateOne
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# A rollup document counts the voice commands sharing these fields on one UTC day
+ROLLUP_KEY = ('user_id', 'day', 'intent', 'detected_language', 'target_language')
+DIMENSIONS = ('day', 'intent', 'detected_language', 'target_language')
+
+
+def day_of(timestamp: datetime) -> str:
+    return timestamp.strftime('%Y-%m-%d')
+
+
+def day_range(days: int, end: Optional[datetime] = None) -> tuple:
+    """(start_day, end_day) covering the last `days` UTC days up to and including end"""
+    end = end or datetime.utcnow()
+    return day_of(end - timedelta(days=days - 1)), day_of(end)
+
+
+def rollup_key(command: dict) -> tuple:
+    return (
+        command['user_id'],
+        day_of(command['timestamp']),
+        command.get('intent') or 'general',
+        command.get('detected_language') or 'unknown',
+        command.get('target_language') or 'unknown',
+    )
+
+
+def count_commands(commands: Iterable[dict]) -> Counter:
+    return Counter(rollup_key(command) for command in commands)
+
+
+class UsageRollups:
+    """Daily usage counters over voice_commands, maintained incrementally as commands are written.
+
+    Dashboards read these documents instead of aggregating the history, so
+    a query costs O(days x distinct intent/language combinations) rather than
+    O(commands). rebuild() recomputes them from the history in bounded
+    batches, for backfills and repairs.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self.increments = 0
+        self.failed = 0
+
+    async def create_indexes(self):
+        await self.collection.create_index([(field, 1) for field in ROLLUP_KEY], unique=True, name="usage_rollup_key")
+        await self.collection.create_index([("day", 1)], name="usage_rollup_day")
+
+    async def record(self, commands: Iterable[dict]):
+        """Increment the rollups for newly written commands, one upsert per distinct key"""
+        counts = count_commands(commands)
+        if not counts:
+            return
+        operations = [
+            UpdateOne(dict(zip(ROLLUP_KEY, key)), {"$inc": {"count": count}}, upsert=True)
+            for key, count in counts.items()
+        ]
+        try:
+            with stage('mongo_usage_rollup'):
+                await self.collection.bulk_write(operations, ordered=False)
+            self.increments += len(operations)
+        except Exception as e:
+            # The history itself was written; a rebuild brings the rollups back in line
+            self.failed += len(operations)
+            logger.error(f"Failed to update {len(operations)} usage rollups: {str(e)}")
+
+    async def usage(self, start_day: str, end_day: str, user_id: Optional[str] = None) -> dict:
+        """Totals and per-dimension breakdowns for the days start_day..end_day (inclusive)"""
+        query = {"day": {"$gte": start_day, "$lte": end_day}}
+        if user_id is not None:
+            query["user_id"] = user_id
+        breakdowns = {dimension: Counter() for dimension in DIMENSIONS}
+        total = 0
+        users = set()
+        with stage('mongo_usage_rollup'):
+            async for rollup in self.collection.find(query, {"_id": 0}):
+                count = rollup.get("count", 0)
+                total += count
+                users.add(rollup["user_id"])
+                for dimension in DIMENSIONS:
+                    breakdowns[dimension][rollup[dimension]] += count
+        return {
+            "start_day": start_day,
+            "end_day": end_day,
+            "total_commands": total,
+            "active_users": len(users),
+            "by_day": [{"day": day, "count": count} for day, count in sorted(breakdowns["day"].items())],
+            "by_intent": dict(breakdowns["intent"].most_common()),
+            "by_detected_language": dict(breakdowns["detected_language"].most_common()),
+            "by_target_language": dict(breakdowns["target_language"].most_common()),
+        }
+
+    async def rebuild(self, history, until: datetime, since: Optional[datetime] = None,
+                      batch_size: int = 1000, pause: float = 0.0) -> dict:
+        """Recompute the rollups for commands in [since, until) from the history.
+
+        The history is read in _id order, batch_size documents per query with
+        an optional pause between batches to limit the load on the database.
+        Counts are written with $set, so a rebuild can be re-run safely;
+        rollups in the range with no commands left are deleted. until should
+        be a day boundary in the past: live writes keep incrementing the
+        current day while the rebuild runs.
+        """
+        time_range = {"$lt": until}
+        if since is not None:
+            time_range["$gte"] = since
+        projection = {field: 1 for field in ('user_id', 'timestamp', 'intent', 'detected_language', 'target_language')}
+
+        counts = Counter()
+        scanned = 0
+        last_id = None
+        started = time.perf_counter()
+        while True:
+            query = {"timestamp": time_range}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await history.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            counts.update(count_commands(batch))
+            scanned += len(batch)
+            last_id = batch[-1]["_id"]
+            if pause:
+                await asyncio.sleep(pause)
+
+        operations = [
+            UpdateOne(dict(zip(ROLLUP_KEY, key)), {"$set": {"count": count}}, upsert=True)
+            for key, count in counts.items()
+        ]
+        for offset in range(0, len(operations), batch_size):
+            await self.collection.bulk_write(operations[offset:offset + batch_size], ordered=False)
+            if pause:
+                await asyncio.sleep(pause)
+
+        rebuilt_days = {"$lt": day_of(until)}
+        if since is not None:
+            rebuilt_days["$gte"] = day_of(since)
+        stale = [
+            rollup["_id"]
+            async for rollup in self.collection.find({"day": rebuilt_days}, {field: 1 for field in ROLLUP_KEY})
+            if tuple(rollup[field] for field in ROLLUP_KEY) not in counts
+        ]
+        for offset in range(0, len(stale), batch_size):
+            await self.collection.delete_many({"_id": {"$in": stale[offset:offset + batch_size]}})
+
+        return {
+            "commands_scanned": scanned,
+            "rollups_written": len(operations),
+            "rollups_deleted": len(stale),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def stats(self) -> dict:
+        return {"increments": self.increments, "failed": self.failed}
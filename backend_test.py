@@ -197,10 +197,46 @@ class VoiceAssistantAPITester:
                 
         return all_passed
 
+    def test_batch_translation(self):
+        """Test batch translation with duplicate inputs"""
+        success, response = self.run_test(
+            "Batch Translation",
+            "POST",
+            "translate/batch",
+            200,
+            data={
+                "texts": ["Good morning", "Thank you", "Good morning"],
+                "target_languages": ["hi", "ta"]
+            }
+        )
+        if success and isinstance(response, dict):
+            return len(response.get('results', [])) == 3
+        return False
+
     def test_command_history(self):
         """Test command history retrieval"""
         return self.run_test("Command History", "GET", "command-history", 200)
 
+    def test_command_history_export(self):
+        """Test the full history streams back as NDJSON"""
+        success, response = self.run_test("Command History Export", "GET", "command-history/export", 200)
+        if success:
+            return all(json.loads(line).get("id") for line in response.splitlines())
+        return False
+
+    def test_usage_analytics(self):
+        """Test usage analytics are served from the daily rollups"""
+        success, response = self.run_test(
+            "Usage Analytics",
+            "GET",
+            "analytics/usage",
+            200,
+            params={"days": 7}
+        )
+        if success and isinstance(response, dict):
+            return "total_commands" in response and "by_intent" in response
+        return False
+
     def test_text_to_speech(self):
         """Test text-to-speech conversion"""
         success, response = self.run_test(
@@ -215,6 +251,20 @@ class VoiceAssistantAPITester:
         )
         return success
 
+    def test_text_to_speech_stream(self):
+        """Test streaming text-to-speech returns raw MP3 audio"""
+        success, response = self.run_test(
+            "Text-to-Speech Stream",
+            "GET",
+            "text-to-speech/stream",
+            200,
+            params={
+                "text": "Hello, this is a test",
+                "language": "en"
+            }
+        )
+        return success
+
     def test_duplicate_registration(self):
         """Test duplicate user registration"""
         success, response = self.run_test(
@@ -234,7 +284,9 @@ def main():
     print("🚀 Starting Multilingual Voice Assistant API Tests")
     print("=" * 60)
     
-    tester = VoiceAssistantAPITester()
+    # Point the tests at another deployment (e.g. a local server running with
+    # ASR_PROVIDER=local) with: python backend_test.py http://localhost:8001/api
+    tester = VoiceAssistantAPITester(*sys.argv[1:2])
     
     # Test sequence
     tests = [
@@ -248,8 +300,12 @@ def main():
         ("Protected Route (No Token)", tester.test_protected_route_without_token),
         ("Voice Command Processing", tester.test_process_voice_command),
         ("Translation", tester.test_translation),
+        ("Batch Translation", tester.test_batch_translation),
         ("Text-to-Speech", tester.test_text_to_speech),
+        ("Text-to-Speech Stream", tester.test_text_to_speech_stream),
         ("Command History", tester.test_command_history),
+        ("Command History Export", tester.test_command_history_export),
+        ("Usage Analytics", tester.test_usage_analytics),
     ]
 
     print(f"\n📋 Running {len(tests)} test categories...")
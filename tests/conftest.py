@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The app module with local providers and throwaway cache paths, without starting it"""
+    sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+    from harness import configure_offline_environment
+
+    configure_offline_environment(provider_latency=0)
+    import server
+
+    return server
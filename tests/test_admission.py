@@ -0,0 +1,47 @@
+import pytest
+from fastapi import HTTPException
+
+from admission import HIGH, LOW, NORMAL, AdmissionController, MemoryBucketStore
+
+
+def controller(max_concurrent=10):
+    return AdmissionController(MemoryBucketStore(), max_concurrent=max_concurrent, enabled=True)
+
+
+def test_hold_takes_a_slot_until_released():
+    admission = controller()
+    slots = admission.hold('audio', NORMAL)
+    assert (slots, admission.in_flight) == (1, 1)
+    admission.release(slots)
+    assert admission.in_flight == 0
+
+
+def test_hold_sheds_by_priority_share():
+    admission = controller()
+    held = [admission.hold('audio', NORMAL) for _ in range(6)]
+    with pytest.raises(HTTPException) as rejected:
+        admission.hold('translation', LOW)
+    assert rejected.value.status_code == 503
+    assert "Retry-After" in rejected.value.headers
+
+    held += [admission.hold('audio', NORMAL) for _ in range(3)]
+    with pytest.raises(HTTPException):
+        admission.hold('audio', NORMAL)
+    held.append(admission.hold('voice', HIGH))
+    assert admission.in_flight == 10
+    assert admission.shed == 2
+
+    admission.release(sum(held))
+    assert admission.in_flight == 0
+
+
+def test_disabled_controller_holds_nothing():
+    admission = AdmissionController(MemoryBucketStore(), max_concurrent=0, enabled=False)
+    assert admission.hold('audio', HIGH) == 0
+    assert admission.in_flight == 0
+
+
+def test_acquire_outside_the_middleware_takes_no_slot():
+    admission = controller()
+    admission.acquire('audio', NORMAL)
+    assert admission.in_flight == 0
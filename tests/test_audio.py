@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+import audio
+
+
+@pytest.mark.parametrize("rate", [48000, 44100, 22050, 8000])
+def test_streaming_resampler_matches_resampling_the_whole_stream(rate):
+    rng = np.random.default_rng(0)
+    t = np.arange(2 * rate) / rate
+    samples = (0.5 * np.sin(2 * np.pi * 440 * t) + 0.1 * rng.standard_normal(len(t))).astype(np.float32)
+
+    resampler = audio.StreamingResampler(rate)
+    parts = [resampler.feed(samples[start:start + 4096]) for start in range(0, len(samples), 4096)]
+    parts.append(resampler.flush())
+    streamed = np.concatenate(parts)
+
+    whole = audio.resample(samples, rate)
+    assert abs(len(streamed) - len(whole)) <= 1
+    length = min(len(streamed), len(whole))
+    np.testing.assert_allclose(streamed[:length], whole[:length], atol=1e-5)
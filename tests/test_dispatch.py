@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from dispatch import BackendPool
+
+
+def failing():
+    raise RuntimeError("provider down")
+
+
+def ok():
+    return "ok"
+
+
+def test_cancelled_half_open_trial_lets_the_next_call_through():
+    async def scenario():
+        pool = BackendPool("test", max_workers=2, max_queue=2, timeout=5.0)
+        pool.breaker.failure_threshold = 1
+        pool.breaker.cooldown = 0.05
+
+        with pytest.raises(RuntimeError):
+            await pool.run(failing)
+        assert pool.breaker.state == pool.breaker.OPEN
+        with pytest.raises(HTTPException) as rejected:
+            await pool.run(ok)
+        assert rejected.value.status_code == 503
+
+        await asyncio.sleep(0.06)
+        release = threading.Event()
+        trial = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        assert pool.breaker.state == pool.breaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        release.set()
+
+        assert await pool.run(ok) == "ok"
+        assert pool.breaker.state == pool.breaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_a_single_trial():
+    async def scenario():
+        pool = BackendPool("test", max_workers=2, max_queue=2, timeout=5.0)
+        pool.breaker.failure_threshold = 1
+        pool.breaker.cooldown = 0.0
+        with pytest.raises(RuntimeError):
+            await pool.run(failing)
+
+        release = threading.Event()
+        trial = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as rejected:
+            await pool.run(ok)
+        assert rejected.value.status_code == 503
+        release.set()
+        assert await trial is True
+        assert pool.breaker.state == pool.breaker.CLOSED
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from history_writer import DUPLICATE_KEY, HistoryWriter
+
+
+class FlakyCollection:
+    """Collection whose first insert_many calls fail according to `failures`"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.documents = {}
+
+    async def insert_many(self, documents, ordered=True):
+        failure = self.failures.pop(0) if self.failures else None
+        if failure == 'down':
+            raise AutoReconnect("connection refused")
+        errors = []
+        for index, document in enumerate(documents):
+            if document['id'] in self.documents:
+                errors.append({'index': index, 'code': DUPLICATE_KEY})
+            elif failure == 'partial' and int(document['id'].rsplit('-', 1)[1]) % 2:
+                errors.append({'index': index, 'code': 121})
+            else:
+                self.documents[document['id']] = document
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+class Rollups:
+    def __init__(self):
+        self.recorded = []
+
+    async def record(self, commands):
+        self.recorded.extend(command['id'] for command in commands)
+
+
+def commands(count, user_id='user'):
+    return [{'id': f"{user_id}-{index}", 'user_id': user_id} for index in range(count)]
+
+
+def test_retries_an_outage_without_losing_history():
+    async def scenario():
+        collection, rollups = FlakyCollection(['down', 'down']), Rollups()
+        writer = HistoryWriter(collection, flush_interval=0.01, rollups=rollups, retry_backoff=0.01)
+        writer.start()
+        for command in commands(5):
+            await writer.submit(command)
+        await writer.stop()
+        assert len(collection.documents) == 5
+        assert sorted(rollups.recorded) == sorted(collection.documents)
+        assert writer.stats()['failed'] == 0 and writer.stats()['retries'] == 2
+
+    asyncio.run(scenario())
+
+
+def test_partial_failure_retries_and_rolls_up_only_the_failed_documents():
+    async def scenario():
+        collection, rollups = FlakyCollection(['partial', 'partial', 'partial']), Rollups()
+        writer = HistoryWriter(collection, rollups=rollups, max_retries=1, retry_backoff=0.01)
+        await writer._insert(commands(4))
+        # Odd commands fail on both attempts; the retry only resends them
+        assert sorted(collection.documents) == ['user-0', 'user-2']
+        assert sorted(rollups.recorded) == ['user-0', 'user-2']
+        assert writer.written == 2 and writer.failed == 2
+
+    asyncio.run(scenario())
+
+
+def test_wait_written_flushes_the_users_pending_commands():
+    async def scenario():
+        collection = FlakyCollection()
+        writer = HistoryWriter(collection, flush_interval=10.0)
+        writer.start()
+        for command in commands(3) + commands(2, 'other'):
+            await writer.submit(command)
+        await asyncio.wait_for(writer.wait_written('user'), 1.0)
+        assert {'user-0', 'user-1', 'user-2'} <= set(collection.documents)
+        await writer.stop()
+
+    asyncio.run(scenario())
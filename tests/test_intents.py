@@ -0,0 +1,52 @@
+import pytest
+
+from intents import INTENT_KEYWORDS, IntentMatcher, intent_matcher
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("hi there", "greeting"),
+    ("this is a thing", "general"),     # 'hi' inside 'this'
+    ("whiteboard", "general"),
+    ("Hello!", "greeting"),
+    ("what TIME is it", "time"),
+    ("what\n  time is it", "time"),     # multi-word keywords span any whitespace
+    ("translate this", "translate"),
+])
+def test_keywords_match_whole_words_only(text, intent):
+    assert intent_matcher.classify(text) == intent
+
+
+def test_indic_keywords_do_not_match_inside_longer_words():
+    assert intent_matcher.classify("नमस्ते") == "greeting"
+    # A vowel sign continues the word, so this is not the keyword 'नमस्ते'
+    assert intent_matcher.classify("नमस्तेा") == "general"
+    assert intent_matcher.classify("இப்போது நேரம் என்ன") == "time"
+
+
+def test_highest_score_wins():
+    # One greeting keyword, two joke keywords
+    assert intent_matcher.classify("hello, tell me a funny joke") == "joke"
+    assert intent_matcher.scores("hello, tell me a funny joke") == {"greeting": 1, "joke": 2}
+
+
+def test_ties_go_to_the_intent_listed_first():
+    assert list(INTENT_KEYWORDS).index("time") < list(INTENT_KEYWORDS).index("greeting")
+    assert intent_matcher.classify("hello, what time is it") == "time"
+
+    matcher = IntentMatcher({"b": ["beta"], "a": ["alpha"]})
+    assert matcher.classify("alpha beta") == "b"
+    assert matcher.classify("nothing here") == matcher.default
+
+
+def test_longest_phrase_wins_at_the_same_offset():
+    matcher = IntentMatcher({"short": ["good"], "long": ["good morning"]})
+    assert matcher.scores("good morning") == {"long": 1}
+
+
+def test_classify_batch_agrees_with_classify():
+    texts = [
+        "hi there", "this is a thing", "hello, tell me a funny joke", "hello, what time is it", "",
+        "नमस्ते", "नमस्तेा", "translate\nthis", "hi", "time", "joke hi",
+    ]
+    assert intent_matcher.classify_batch(texts) == [intent_matcher.classify(text) for text in texts]
+    assert intent_matcher.classify_batch([]) == []
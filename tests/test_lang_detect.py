@@ -0,0 +1,64 @@
+import pytest
+
+from lang_detect import LATIN, OTHER, detect_language, detect_languages, script_counts
+
+
+@pytest.mark.parametrize("text, language, script", [
+    ("अभी समय क्या है", "hi", "devanagari"),
+    ("இப்போது நேரம் என்ன", "ta", "tamil"),
+    ("ఇప్పుడు సమయం ఎంత", "te", "telugu"),
+    ("ಈಗ ಸಮಯ ಎಷ್ಟು", "kn", "kannada"),
+    ("ഇപ്പോൾ സമയം എത്ര", "ml", "malayalam"),
+])
+def test_indic_scripts_identify_their_language(text, language, script):
+    detection = detect_language(text)
+    assert (detection.language, detection.script) == (language, script)
+    assert detection.confidence == 1.0
+
+
+def test_script_counts_ignore_digits_punctuation_and_spaces():
+    assert script_counts("नमस्ते, 123 hi!") == {"devanagari": 6, LATIN: 2}
+    assert script_counts("你好") == {OTHER: 2}
+
+
+@pytest.mark.parametrize("text", [
+    "kya samay hua hai",      # romanized Hindi
+    "mujhe ek mazak sunao",
+    "ippo neram enna",        # romanized Tamil
+])
+def test_romanized_indic_defers_to_the_provider(text):
+    assert detect_language(text) is None
+
+
+@pytest.mark.parametrize("text", ["what time is it", "Tell me a joke, please!", "hello", "thanks"])
+def test_english_markers_detect_english(text):
+    detection = detect_language(text)
+    assert detection.language == "en" and detection.script == LATIN
+
+
+def test_english_needs_a_share_of_markers_in_longer_text():
+    # One marker in six words is not enough to call it English
+    assert detect_language("the quarterly revenue forecast looks promising") is None
+    # In one or two words a single marker is
+    assert detect_language("hello bhai").language == "en"
+
+
+def test_mixed_script_follows_the_dominant_script():
+    detection = detect_language("मुझे एक joke सुनाओ")
+    assert detection.language == "hi"
+    assert 0.6 <= detection.confidence < 1.0
+
+
+def test_evenly_mixed_script_defers_to_the_provider():
+    assert detect_language("hello नमस्ते") is None
+    assert detect_language("வணக்கம் नमस्ते") is None
+
+
+@pytest.mark.parametrize("text", ["", "   ", "123 !?", "你好世界"])
+def test_text_without_a_supported_script_defers_to_the_provider(text):
+    assert detect_language(text) is None
+
+
+def test_detect_languages_matches_detect_language():
+    texts = ["अभी समय क्या है", "kya samay hua hai", "what time is it"]
+    assert detect_languages(texts) == [detect_language(text) for text in texts]
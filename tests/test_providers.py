@@ -0,0 +1,27 @@
+import pytest
+
+import providers
+
+
+def test_partial_provider_fails_at_construction():
+    class HalfTranslation(providers.TranslationProvider):
+        def translate(self, text, dest, src='auto'):
+            return providers.Translation(text, src, dest)
+
+    with pytest.raises(TypeError, match='detect'):
+        HalfTranslation()
+
+
+def test_tts_provider_must_implement_stream():
+    class SynthesizeOnly(providers.TTSProvider):
+        def synthesize(self, text, language, slow=False):
+            return b''
+
+    with pytest.raises(TypeError, match='stream'):
+        SynthesizeOnly()
+
+
+def test_local_providers_implement_the_interfaces():
+    assert providers.LocalASR().transcribe(b'') == "hello what time is it"
+    assert providers.LocalTranslation().detect("नमस्ते").lang == 'hi'
+    assert providers.LocalTTS().synthesize("hi", 'en')
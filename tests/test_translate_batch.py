@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+
+def translate_batch(server, texts, target_languages, user_id="user"):
+    user = server.CurrentUser(id=user_id, username=user_id, email=f"{user_id}@test.local", created_at=datetime.utcnow())
+    request = server.BatchTranslationRequest(texts=texts, target_languages=target_languages)
+    return asyncio.run(server.translate_batch(request, user))
+
+
+def batch_tokens_used(server, user_id):
+    tokens, _ = server.admission.store._buckets[f"translation_batch:{user_id}"]
+    return server.admission.limits['translation_batch'][1] - tokens
+
+
+def test_batch_keeps_the_formatting_of_each_text(server):
+    response = translate_batch(server, ["a\nb", "  a\nb ", "a  b", "a\nb", ""], ["hi"])
+    translations = [item["translations"]["hi"] for item in response["results"]]
+    assert translations == ["[hi] a\nb", "  [hi] a\nb ", "[hi] a  b", "[hi] a\nb", ""]
+    # Surrounding whitespace does not make a text distinct; inner whitespace does
+    assert response["unique_requests"] == 2
+
+
+def test_translation_cache_keeps_inner_whitespace_apart(server):
+    make_key = server.TranslationCache.make_key
+    assert make_key("a\nb", "hi") != make_key("a b", "hi")
+    assert make_key(" a b\n", "hi") == make_key("a b", "hi")
+
+
+def test_batch_larger_than_the_translation_burst_is_admitted(server):
+    from admission import MemoryBucketStore
+
+    store, enabled = server.admission.store, server.admission.enabled
+    server.admission.store, server.admission.enabled = MemoryBucketStore(), True
+    try:
+        burst = server.admission.limits['translation'][1]
+        texts = [f"batch text {index}" for index in range(burst + 20)]
+        response = translate_batch(server, texts, ["hi", "ta"], user_id="bulk")
+        assert all(not item["errors"] for item in response["results"])
+        used = batch_tokens_used(server, "bulk")
+        assert used == pytest.approx(2 * len(texts), abs=1)
+
+        # Already cached pairs are free
+        translate_batch(server, texts, ["hi", "ta"], user_id="bulk")
+        assert batch_tokens_used(server, "bulk") <= used
+    finally:
+        server.admission.store, server.admission.enabled = store, enabled